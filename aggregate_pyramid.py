@@ -0,0 +1,152 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+LEVELS = ("1h", "6h", "1d", "1w")
+STATS = ("min", "max", "sum", "count")
+
+
+class AggregateLevel:
+    def __init__(self, width):
+        self.width = width
+        self.starts = np.empty(0, dtype="int64")
+        self.stats = {stat: np.empty(0, dtype="float64") for stat in STATS}
+
+    def truncate(self, start):
+        # Drops the buckets from the one containing start (ns) onwards.
+        keep = np.searchsorted(self.starts, start - start % self.width)
+        self.starts = self.starts[:keep]
+        for stat in STATS:
+            self.stats[stat] = self.stats[stat][:keep]
+
+    def extend(self, times, values):
+        # Appends the buckets of sorted rows that all follow the last bucket.
+        if not len(times):
+            return
+        buckets = times - times % self.width
+        first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        present = ~np.isnan(values)
+        new = {
+            "min": np.fmin.reduceat(values, first),
+            "max": np.fmax.reduceat(values, first),
+            "sum": np.add.reduceat(np.where(present, values, 0.0), first),
+            "count": np.add.reduceat(present, first).astype("float64"),
+        }
+        self.starts = np.concatenate([self.starts, buckets[first]])
+        for stat in STATS:
+            self.stats[stat] = np.concatenate([self.stats[stat], new[stat]])
+
+
+def _edge(times, values):
+    # Min and max of the rows of a bucket only partly inside a plotted range,
+    # placed at its first row; nothing if the rows hold no value.
+    if not len(values) or np.isnan(values).all():
+        return [], []
+    return [times[0], times[0]], [np.nanmin(values), np.nanmax(values)]
+
+
+class AggregatePyramid:
+    # Per-column min/max/sum/count of a time-indexed frame at every level in
+    # LEVELS. A column's levels are built the first time it is asked for, so
+    # a worker only holds the aggregates of the columns that are plotted. A
+    # refresh recomputes only the buckets from the first changed row onwards,
+    # so appending to the history costs what the new rows cost.
+
+    def __init__(self, frame, levels=LEVELS):
+        self.widths = [pd.Timedelta(level).value for level in levels]
+        self._frame = frame
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def _levels(self, column):
+        with self._lock:
+            levels = self._columns.get(column)
+            if levels is None and column in self._frame:
+                levels = [AggregateLevel(width) for width in self.widths]
+                times = self._frame.index.asi8
+                values = self._frame[column].to_numpy(dtype="float64")
+                for level in levels:
+                    level.extend(times, values)
+                self._columns[column] = levels
+            return levels
+
+    def forget(self, column):
+        # For a column replaced as a whole; rebuilt when next asked for.
+        with self._lock:
+            self._columns.pop(column, None)
+
+    def refresh(self, frame, changed_from=0):
+        # frame replaces the one the pyramid was built from; rows before
+        # changed_from are unchanged since the last refresh.
+        with self._lock:
+            self._frame = frame
+            times = frame.index.asi8
+            if changed_from >= len(times):
+                return
+            changed = times[changed_from]
+            for column, levels in list(self._columns.items()):
+                if column not in frame:
+                    del self._columns[column]
+                    continue
+                starts = [
+                    np.searchsorted(times, changed - changed % level.width)
+                    for level in levels
+                ]
+                offset = min(starts)
+                values = frame[column].iloc[offset:].to_numpy(dtype="float64")
+                for level, start in zip(levels, starts):
+                    level.truncate(changed)
+                    level.extend(times[start:], values[start - offset:])
+
+    def level_for(self, start, end, n_rows, max_buckets):
+        # Index of the finest level that fits the span into max_buckets, or
+        # None if the raw rows already do.
+        if n_rows <= max_buckets * 2:
+            return None
+        for i, width in enumerate(self.widths):
+            if (end - start) // width + 1 <= max_buckets:
+                return i
+        return len(self.widths) - 1
+
+    def envelope(self, column, times, values, max_points):
+        # Bucket minima and maxima over a contiguous run of the frame's rows,
+        # given as their times (ns) and values, as plottable x and y
+        # alternating min, max; None when the raw rows should be plotted
+        # instead. The buckets at either end that are only partly inside the
+        # run are computed from its own rows, so no row outside it shows up.
+        start, end = times[0], times[-1]
+        i = self.level_for(start, end, len(times), max_points // 2)
+        levels = None if i is None else self._levels(column)
+        if levels is None:
+            return None
+        level = levels[i]
+        width = level.width
+        # Whole buckets start at inner_start or later and before inner_end.
+        inner_start = start + (-start) % width
+        inner_end = end + 1 - (end + 1) % width
+        head = np.searchsorted(times, inner_start)
+        tail = np.searchsorted(times, max(inner_start, inner_end))
+        first = np.searchsorted(level.starts, inner_start)
+        last = np.searchsorted(level.starts, inner_end)
+        present = level.stats["count"][first:last] > 0
+        inner_x = np.repeat(level.starts[first:last][present], 2)
+        inner_y = np.column_stack(
+            [
+                level.stats["min"][first:last][present],
+                level.stats["max"][first:last][present],
+            ]
+        ).ravel()
+        head_x, head_y = _edge(times[:head], values[:head])
+        tail_x, tail_y = _edge(times[tail:], values[tail:])
+        x = np.concatenate([head_x, inner_x, tail_x]).astype("int64")
+        y = np.concatenate([head_y, inner_y, tail_y])
+        return x.astype("datetime64[ns]"), y
+
+    def means(self, column, level_index=0):
+        # Bucket means of one level, e.g. for a smoothed trend line.
+        level = self._levels(column)[level_index]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = level.stats["sum"] / level.stats["count"]
+        index = pd.DatetimeIndex(level.starts.astype("datetime64[ns]"))
+        return pd.Series(mean, index=index)
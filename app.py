@@ -1,15 +1,40 @@
-import pandas as pd
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
 import dash
 import dash_bootstrap_components as dbc
 import dash_core_components as dcc
 import dash_html_components as html
 import dash_daq as daq
+import numpy as np
 
 import plotly.graph_objs as go
 from dash.dependencies import Input, Output, State
-from datetime import datetime, date
-from data_preprocessing import data_preprocessing
-import pickle
+from flask import jsonify, request
+from aggregate_pyramid import AggregatePyramid
+from background_jobs import DONE, FAILED, PENDING, RUNNING, job_queue_from_env
+from batch_scoring import ScoringError, parse_windows, score_windows
+from data_cache import (
+    AppendLog,
+    cache_entry,
+    cached_data_preprocessing,
+    dataset_settings_from_env,
+)
+from data_preprocessing import TIMESTEPS
+from downsampling import TARGET_POINTS, downsample
+from figure_cache import figure_cache_from_env, figure_key
+from incremental_preprocessing import IncrementalPreprocessor, parse_new_data
+from live_replay import REPLAY_WINDOW, ReplayStream, rows_due
+from memory_usage import memory_report
+from metrics import instrument, metrics
+from model_registry import registry as model_registry
+from prediction_cache import prediction_cache, score_window, store_result, window_key
+from rul_timeline import PREDICTED_RUL, load_or_build_timeline, predict_timeline
+from time_range import RowLookup, row_range, time_slice
 
 app = dash.Dash(
     __name__,
@@ -17,6 +42,9 @@ app = dash.Dash(
     external_stylesheets=[dbc.themes.CYBORG],
 )
 server = app.server
+# Request and per-stage timings, served as Prometheus text at /metrics. With
+# PROFILE_DIR set every callback request is also profiled into that directory.
+instrument(server, os.environ.get("PROFILE_DIR"))
 app.title = "Predictive Maintenance Dashboard"
 
 
@@ -42,7 +70,164 @@ def logo(app):
     )
 
 
-df, df_button, x_test, y_test, x_train = data_preprocessing()
+dataset_settings = dataset_settings_from_env()
+compact_dtypes = dataset_settings["compact"]
+df, df_button, x_test, y_test, x_train = cached_data_preprocessing(
+    **dataset_settings, mmap_mode="r"
+)
+print(memory_report((df, df_button, x_test, y_test, x_train)))
+
+# Min/max/mean/count per feature at 1h to 1w, so long ranges are plotted from
+# bucket aggregates instead of raw 10-minute rows. Built per feature the first
+# time it is plotted.
+pyramid = AggregatePyramid(df)
+
+# Predicted RUL over the whole history, scored once per model and dataset by
+# rul_timeline and plotted against the actual RUL from the feature dropdown.
+timeline_version = None
+timeline_lock = threading.Lock()
+
+
+def refresh_timeline():
+    # Scores the history with the registry's current model, the first time and
+    # again after a hot swap. A model that is missing or cannot score the
+    # history leaves the column out; only 'Predict' then reports the error.
+    global timeline_version
+    with timeline_lock:
+        try:
+            model = model_registry.get()
+        except Exception as e:
+            print(f"Predicted RUL left out: {e!r}")
+            return
+        if model.version == timeline_version:
+            return
+        timeline_version = model.version
+        try:
+            timeline = load_or_build_timeline(model, df, (x_train, x_test))
+        except Exception as e:
+            print(f"Predicted RUL left out, {model.version} failed: {e!r}")
+            df.drop(columns=PREDICTED_RUL, inplace=True, errors="ignore")
+            pyramid.forget(PREDICTED_RUL)
+            return
+        df[PREDICTED_RUL] = timeline
+        pyramid.forget(PREDICTED_RUL)
+
+
+refresh_timeline()
+
+# The five gauge readings ride along with every Main-Graph point as customdata
+# and a clientside callback shows them on click. Points come from df,
+# df_button (a tail of df) or the aggregate pyramid, so df covers them all.
+GAUGE_COLUMNS = [
+    "WEC: ava. Power",
+    "WEC: ava. available P from wind",
+    "WEC: ava. windspeed",
+    "WEC: ava. reactive Power",
+    "WEC: ava. blade angle A",
+]
+gauge_lookup = RowLookup(df, GAUGE_COLUMNS)
+
+# Predictions run on the job queue: the callback returns straight away and
+# the job-poll interval picks the result up once the job has finished.
+jobs = job_queue_from_env()
+
+
+# Content hash of x_test, computed once per published x_test rather than on
+# every poll.
+x_test_key = window_key(x_test)
+
+
+def prediction_job(retry=False):
+    # Polls only read a failed job; a new 'Predict' click (retry) reruns it.
+    model = model_registry.get()
+    key = ("predict", model.version, x_test_key)
+    return jobs.submit(
+        key,
+        score_window,
+        model.name,
+        x_test,
+        x_test_key,
+        finish=store_result,
+        retry=retry,
+    )
+
+
+# Figures are cached as JSON per inputs and data version; data_version moves
+# on whenever append_new_data publishes new frames, and is the same in every
+# worker serving the same cached data, so a shared FIGURE_CACHE_DIR is safe.
+figure_cache = figure_cache_from_env()
+metrics.collect_stats("dashboard_figure_cache", "Figure cache", figure_cache.stats)
+metrics.collect_stats(
+    "dashboard_prediction_cache", "Prediction cache", prediction_cache.stats
+)
+data_version = f"0:{len(df)}:{df.index[-1]}"
+
+# With REPLAY_SPEEDUP set, 'Get New Data' replays the last week row by row at
+# that many times the 10-minute cadence instead of showing it all at once.
+replay_speedup = float(os.environ.get("REPLAY_SPEEDUP", 0))
+replay_streams = OrderedDict()
+replay_lock = threading.Lock()
+
+# New SCADA rows and status events, posted to /api/new-data, go to a log next
+# to the cache entry that every worker replays; applied_appends counts the log
+# entries this worker's frames include.
+append_log = AppendLog(os.path.join(cache_entry(**dataset_settings)[0], "appends"))
+applied_appends = 0
+incremental_state = None
+incremental_lock = threading.Lock()
+
+
+def sync_new_data():
+    # Replays the log entries this worker has not applied yet, whichever worker
+    # wrote them, and publishes the updated frames to this process's callbacks.
+    # The first replay seeds the incremental state from the cache entry.
+    global incremental_state, df, df_button, x_test, y_test, x_train
+    global data_version, x_test_key, applied_appends
+    global timeline_version
+    if len(append_log) == applied_appends:
+        return
+    with incremental_lock, timeline_lock:
+        entries = list(append_log.read(applied_appends))
+        if not entries:
+            return
+        if incremental_state is None:
+            incremental_state = IncrementalPreprocessor.from_cache_entry(
+                os.path.dirname(append_log.directory), compact=compact_dtypes
+            )
+        previous = df
+        changed = rows_changed = len(previous)
+        for scada_rows, status_events in entries:
+            frames = incremental_state.append(scada_rows, status_events)
+            changed = min(changed, incremental_state.changed_from)
+            rows_changed = min(rows_changed, incremental_state.rows_changed_from)
+        df, df_button, x_test, y_test, x_train = frames
+        applied_appends += len(entries)
+        # Windows reaching into relabelled rows change, earlier ones do not.
+        changed = max(changed - TIMESTEPS, 0)
+        if PREDICTED_RUL in previous:
+            model = model_registry.get()
+            if model.version == timeline_version:
+                df[PREDICTED_RUL] = predict_timeline(
+                    model,
+                    len(df),
+                    (x_train, x_test),
+                    start=changed,
+                    previous=previous[PREDICTED_RUL].values,
+                )
+            else:  # swapped meanwhile; refresh_timeline rescores it all
+                timeline_version = None
+        pyramid.refresh(df, changed)
+        gauge_lookup.extend(df, rows_changed)
+        x_test_key = window_key(x_test)
+        data_version = f"{applied_appends}:{len(df)}:{df.index[-1]}"
+
+
+def append_new_data(scada_rows=None, status_events=None):
+    append_log.write(scada_rows, status_events)
+    sync_new_data()
+
+
+sync_new_data()
 
 predict_button = dbc.Card(
     className="mt-auto",
@@ -133,6 +318,14 @@ graphs = dbc.Card(
                             config={"displayModeBar": False},
                         ),
                         html.Pre(id="update-on-click-data"),
+                        dcc.Interval(
+                            id="job-poll-interval", interval=500, disabled=True
+                        ),
+                        dcc.Interval(
+                            id="replay-interval", interval=1000, disabled=True
+                        ),
+                        dcc.Store(id="replay-state"),
+                        dcc.Store(id="live-rul"),
                     ],
                     style={"width": "98%", "display": "inline-block"},
                 ),
@@ -646,21 +839,113 @@ def fig_update_layout(fig):
     return fig
 
 
-@app.callback(
-    [
-        Output("Main-Graph", "figure"),
-        Output("rul-estimation-indicator-led", "value"),
-        Output("Info-Textbox", "value"),
-    ],
-    [
-        Input("feature-dropdown", "value"),
-        Input("date-picker", "start_date"),
-        Input("date-picker", "end_date"),
-        Input("get-new-info-button", "n_clicks"),
-        Input("predict-button", "n_clicks"),
-    ],
-)
-def update_graph(selected_column, start_date, end_date, n_get_new_info, n_pred):
+target_points = int(os.environ.get("GRAPH_POINTS", TARGET_POINTS))
+downsample_method = os.environ.get("DOWNSAMPLE_METHOD", "minmax")
+
+
+def downsampled_trace(frame, column, x_range=None, **kwargs):
+    # At most target_points over the whole frame, from the pyramid level that
+    # fits them or from the raw rows, plus as many again over the zoomed-in
+    # window, so the payload does not grow with the history and the visible
+    # part is drawn at full resolution once it is small enough. The window's
+    # points replace the overview's inside it, so no row is sent twice.
+    index = frame.index.asi8
+    values = frame[column].values
+    overview = None
+    if len(index):
+        overview = pyramid.envelope(column, index, values, target_points)
+    if overview is None:
+        positions = downsample(index, values, target_points, downsample_method)
+        x, y = frame.index.values[positions], values[positions]
+    else:
+        x, y = overview
+    if x_range is not None:
+        start, end = row_range(frame.index, *x_range)
+        visible = start + downsample(
+            index[start:end], values[start:end], target_points, downsample_method
+        )
+        if end > start:
+            times = frame.index.values
+            lo = np.searchsorted(x, times[start])
+            hi = np.searchsorted(x, times[end - 1], side="right")
+            x = np.concatenate([x[:lo], times[visible], x[hi:]])
+            y = np.concatenate([y[:lo], values[visible], y[hi:]])
+    customdata = np.round(gauge_lookup.rows(x), 2)
+    return go.Scatter(x=x, y=y, customdata=customdata, **kwargs)
+
+
+def visible_range(relayout_data):
+    # The x-axis window after a zoom or pan; None once autoscaled again.
+    if not relayout_data:
+        return None
+    if "xaxis.range[0]" in relayout_data:
+        return relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    return relayout_data.get("xaxis.range")
+
+
+def relayout_data_changes_x(relayout_data):
+    return bool(relayout_data) and any(key.startswith("xaxis") for key in relayout_data)
+
+
+def figure_columns(selected_column):
+    if selected_column == PREDICTED_RUL:
+        return [selected_column, "RUL"]
+    return [selected_column]
+
+
+def build_feature_figure(frame, selected_column, x_range=None):
+    with metrics.stage("traces"):
+        data = [downsampled_trace(frame, selected_column, x_range)]
+        if selected_column == PREDICTED_RUL:
+            data.append(downsampled_trace(frame, "RUL", x_range, name="RUL"))
+        fig = go.Figure(data=data)
+    with metrics.stage("layout"):
+        fig = fig_update_layout(fig)
+        # Keep the user's zoom while the same series is redrawn for it.
+        if len(frame):
+            fig.update_layout(
+                uirevision=f"{selected_column}:{frame.index[0]}:{frame.index[-1]}"
+            )
+    with metrics.stage("serialize"):
+        return fig.to_json()
+
+
+def feature_figure(frame, selected_column, x_range=None):
+    # Every plotted frame is a contiguous run of df's rows, so its first and
+    # last time and length identify it within one data version.
+    span = (frame.index[0], frame.index[-1]) if len(frame) else None
+    columns = figure_columns(selected_column)
+    key = figure_key(
+        selected_column,
+        span,
+        len(frame),
+        x_range,
+        data_version,
+        timeline_version if PREDICTED_RUL in columns else None,
+        target_points,
+        downsample_method,
+    )
+    with metrics.stage("figure"):
+        return json.loads(
+            figure_cache.get_or_build(
+                key, lambda: build_feature_figure(frame, selected_column, x_range)
+            )
+        )
+
+
+def graph_outputs(
+    selected_column,
+    start_date,
+    end_date,
+    n_get_new_info,
+    n_pred,
+    x_range=None,
+    new_data=None,
+    job=None,
+):
+    # new_data replaces df_button as the frame shown after 'Get New Data';
+    # job is the prediction job's (state, result) once 'Predict' was pressed.
+    new_data = df_button if new_data is None else new_data
     if n_pred is None:  # here is my work before prediction button is activated.
         value_rul = 0.0
         information_update = (
@@ -671,48 +956,17 @@ def update_graph(selected_column, start_date, end_date, n_get_new_info, n_pred):
         )
         if n_get_new_info is None:
             if selected_column in list(df):
-                if start_date and end_date:
-                    start_date_object = datetime.strptime(start_date, "%Y-%m-%d")
-                    end_date_object = datetime.strptime(end_date, "%Y-%m-%d")
-                    mask = (df.index > start_date_object) & (
-                            df.index <= end_date_object
-                    )
-                    df_within_dates = df.loc[mask]
-                    fig = go.Figure(
-                        data=[
-                            go.Scatter(
-                                x=df_within_dates.index,
-                                y=df_within_dates[selected_column],
-                            )
-                        ]
-                    )
-                    fig = fig_update_layout(fig)
-                    return fig, value_rul, information_update
-                elif start_date:
-                    start_date_object = datetime.strptime(start_date, "%Y-%m-%d")
-                    mask = df.index > start_date_object
-                    df_within_dates = df.loc[mask]
-                    fig = go.Figure(
-                        data=[
-                            go.Scatter(
-                                x=df_within_dates.index,
-                                y=df_within_dates[selected_column],
-                            )
-                        ]
-                    )
-                    fig = fig_update_layout(fig)
-                    return fig, value_rul, information_update
-                else:
-                    fig = go.Figure(
-                        data=[go.Scatter(x=df.index, y=df[selected_column])]
+                with metrics.stage("slice"):
+                    df_within_dates = time_slice(
+                        df,
+                        start_date or None,
+                        end_date or None,
+                        figure_columns(selected_column),
                     )
-                    fig = fig_update_layout(fig)
-                    return fig, value_rul, information_update
+                fig = feature_figure(df_within_dates, selected_column, x_range)
+                return fig, value_rul, information_update
             else:
-                fig = go.Figure(
-                    data=[go.Scatter(x=df.index, y=df["WEC: ava. windspeed"])]
-                )
-                fig = fig_update_layout(fig)
+                fig = feature_figure(df, "WEC: ava. windspeed", x_range)
                 return fig, value_rul, information_update
         else:
             _information_update = (
@@ -725,20 +979,10 @@ def update_graph(selected_column, start_date, end_date, n_get_new_info, n_pred):
                               " appropriate dates on the calendar."
             )
             if selected_column in list(df_button):
-                fig = go.Figure(
-                    data=[
-                        go.Scatter(x=df_button.index, y=df_button[selected_column])
-                    ]
-                )
-                fig = fig_update_layout(fig)
+                fig = feature_figure(new_data, selected_column, x_range)
                 return fig, value_rul, _information_update
             else:
-                fig = go.Figure(
-                    data=[
-                        go.Scatter(x=df_button.index, y=df_button["WEC: ava. windspeed"])
-                    ]
-                )
-                fig = fig_update_layout(fig)
+                fig = feature_figure(new_data, "WEC: ava. windspeed", x_range)
                 return fig, value_rul, _information_update
     else:  # Prediction button is pressed
         if n_get_new_info is None:
@@ -746,82 +990,118 @@ def update_graph(selected_column, start_date, end_date, n_get_new_info, n_pred):
             information_update = " 'Predict' button will not produce a desired result until new information is received." \
                                  " To predict RUL, please use 'Get New Data' button."
             if selected_column in list(df):
-                if start_date and end_date:
-                    start_date_object = datetime.strptime(start_date, "%Y-%m-%d")
-                    end_date_object = datetime.strptime(end_date, "%Y-%m-%d")
-                    mask = (df.index > start_date_object) & (
-                        df.index <= end_date_object
-                    )
-                    df_within_dates = df.loc[mask]
-                    fig = go.Figure(
-                        data=[
-                            go.Scatter(
-                                x=df_within_dates.index,
-                                y=df_within_dates[selected_column],
-                            )
-                        ]
-                    )
-                    fig = fig_update_layout(fig)
-                    return fig, value_rul, information_update
-                elif start_date:
-                    start_date_object = datetime.strptime(start_date, "%Y-%m-%d")
-                    mask = df.index > start_date_object
-                    df_within_dates = df.loc[mask]
-                    fig = go.Figure(
-                        data=[
-                            go.Scatter(
-                                x=df_within_dates.index,
-                                y=df_within_dates[selected_column],
-                            )
-                        ]
+                with metrics.stage("slice"):
+                    df_within_dates = time_slice(
+                        df,
+                        start_date or None,
+                        end_date or None,
+                        figure_columns(selected_column),
                     )
-                    fig = fig_update_layout(fig)
-                    return fig, value_rul, information_update
-                else:
-                    fig = go.Figure(
-                                data=[go.Scatter(x=df.index, y=df[selected_column])]
-                            )
-                    fig = fig_update_layout(fig)
-                    return fig, value_rul, information_update
+                fig = feature_figure(df_within_dates, selected_column, x_range)
+                return fig, value_rul, information_update
             else:
-                fig = go.Figure(
-                            data=[go.Scatter(x=df.index, y=df["WEC: ava. windspeed"])]
-                        )
-                fig = fig_update_layout(fig)
+                fig = feature_figure(df, "WEC: ava. windspeed", x_range)
                 return fig, value_rul, information_update
         else:
-            model = pickle.load(open("assets/xgb_reg.pkl", "rb"))
-            y_pred = model.predict(x_test)
-            df_out = pd.DataFrame()
-            df_out["pred"] = y_pred
-            value_rul = round(max(df_out["pred"]))
-            information_update = "RUL is estimated based on the readings from the last week: " "from " + str(
-                x_test.index[0]
-            ) + " to " + str(
-                x_test.index[-1]
-            )
+            state, result = job if job is not None else jobs.status(prediction_job())
+            if state == DONE:
+                y_pred, value_rul = result
+                information_update = "RUL is estimated based on the readings from the last week: " "from " + str(
+                    x_test.index[0]
+                ) + " to " + str(
+                    x_test.index[-1]
+                )
+            elif state == FAILED:
+                value_rul = 0.0
+                information_update = "RUL estimation failed: " + result
+            else:
+                value_rul = 0.0
+                information_update = "Estimating RUL based on the readings from the last week..."
             start_date = df_button.index[0]
             end_date = df_button.index[-1]
             if selected_column in list(df_button):
-                fig = go.Figure(
-                    data=[
-                        go.Scatter(
-                            x=df_button.index,
-                            y=df_button[selected_column],
-                        )
-                        ]
-                )
-                fig = fig_update_layout(fig)
+                fig = feature_figure(df_button, selected_column, x_range)
                 return fig, value_rul, information_update
             else:
-                fig = go.Figure(
-                    data=[go.Scatter(x=df.index, y=df_button["WEC: ava. windspeed"])]
-                )
-                fig = fig_update_layout(fig)
+                fig = feature_figure(df_button, "WEC: ava. windspeed", x_range)
                 return fig, value_rul, information_update
 
 
 @app.callback(
+    [
+        Output("Main-Graph", "figure"),
+        Output("rul-estimation-indicator-led", "value"),
+        Output("Info-Textbox", "value"),
+        Output("job-poll-interval", "disabled"),
+    ],
+    [
+        Input("feature-dropdown", "value"),
+        Input("date-picker", "start_date"),
+        Input("date-picker", "end_date"),
+        Input("get-new-info-button", "n_clicks"),
+        Input("predict-button", "n_clicks"),
+        Input("job-poll-interval", "n_intervals"),
+        Input("Main-Graph", "relayoutData"),
+        Input("live-rul", "data"),
+    ],
+    [State("replay-state", "data")],
+)
+def update_graph(
+    selected_column,
+    start_date,
+    end_date,
+    n_get_new_info,
+    n_pred,
+    n_intervals,
+    relayout_data,
+    live_rul,
+    replay_state,
+):
+    sync_new_data()
+    if selected_column == PREDICTED_RUL:
+        refresh_timeline()
+    with metrics.stage("select"):
+        predicting = n_pred is not None and n_get_new_info is not None
+        triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+        job = None
+        if predicting:
+            clicked = "predict-button.n_clicks" in triggered
+            job = jobs.status(prediction_job(retry=clicked))
+        pending = job is not None and job[0] in (PENDING, RUNNING)
+    if triggered == ["job-poll-interval.n_intervals"] and pending:
+        return dash.no_update, dash.no_update, dash.no_update, False
+    if triggered == ["live-rul.data"]:
+        if not live_rul or predicting:
+            raise dash.exceptions.PreventUpdate
+        return dash.no_update, live_rul["rul"], live_rul["info"], dash.no_update
+    if triggered == ["Main-Graph.relayoutData"] and not relayout_data_changes_x(
+        relayout_data
+    ):
+        raise dash.exceptions.PreventUpdate
+    fig, value_rul, information_update = graph_outputs(
+        selected_column,
+        start_date,
+        end_date,
+        n_get_new_info,
+        n_pred,
+        visible_range(relayout_data),
+        replayed_frame(n_get_new_info, replay_state, triggered),
+        job,
+    )
+    # Keep polling until the prediction job has finished; a job that finishes
+    # meanwhile is picked up by the next poll.
+    return fig, value_rul, information_update, not pending
+
+
+app.clientside_callback(
+    """
+    function (clickData) {
+        if (!clickData || !clickData.points[0].customdata) {
+            return [0, 0, 0, 0, 0];
+        }
+        return clickData.points[0].customdata;
+    }
+    """,
     [
         Output("active-power-information-gauge", "value"),
         Output("active-power-from-wind-information-gauge", "value"),
@@ -831,42 +1111,134 @@ def update_graph(selected_column, start_date, end_date, n_get_new_info, n_pred):
     ],
     Input("Main-Graph", "clickData"),
 )
-def display_click_data(clickData):
-    if clickData:
-        data_time = clickData["points"][0]["x"]
-        value_active_power = df["WEC: ava. Power"].loc[df.index == data_time].values[0]
-        value_active_power_wind = (
-            df["WEC: ava. available P from wind"].loc[df.index == data_time].values[0]
-        )
-        value_reactive_power = (
-            df["WEC: ava. reactive Power"].loc[df.index == data_time].values[0]
-        )
-        value_wind_speed = (
-            df["WEC: ava. windspeed"].loc[df.index == data_time].values[0]
-        )
-        value_blade_angle = (
-            df["WEC: ava. blade angle A"].loc[df.index == data_time].values[0]
-        )
-        return (
-            value_active_power,
-            value_active_power_wind,
-            value_wind_speed,
-            value_reactive_power,
-            value_blade_angle,
+
+
+def replay_start():
+    # The replay runs over the rows shown as df_button; the week before it is
+    # already on the graph when it starts.
+    return len(x_train)
+
+
+def replayed_frame(n_get_new_info, replay_state, triggered):
+    # What 'Get New Data' shows in replay mode: the week up to the row the
+    # session has replayed so far, so a redraw keeps the streamed points.
+    if not replay_speedup or n_get_new_info is None:
+        return None
+    position = replay_start()
+    if replay_state and "get-new-info-button.n_clicks" not in triggered:
+        position = replay_state["position"]
+    return df.iloc[max(position - REPLAY_WINDOW, 0): position]
+
+
+def replay_stream(session, position):
+    # Streams live in the worker that created them; any other worker (or a
+    # restarted one) rebuilds one from the rows before position, which costs
+    # one window of rows however far the replay has got.
+    with replay_lock:
+        stream = replay_streams.pop(session, None)
+    if stream is None or stream.position != position:
+        features = list(df_button)
+        stream = ReplayStream(model_registry.get(), x_test.columns, len(features))
+        start = max(position - REPLAY_WINDOW - TIMESTEPS + 1, 0)
+        stream.position = start
+        stream.push(df.iloc[start:position][features].to_numpy(dtype="float64"))
+    with replay_lock:
+        replay_streams[session] = stream
+        while len(replay_streams) > 64:
+            replay_streams.popitem(last=False)
+    return stream
+
+
+@app.callback(
+    [
+        Output("Main-Graph", "extendData"),
+        Output("replay-state", "data"),
+        Output("live-rul", "data"),
+        Output("replay-interval", "disabled"),
+    ],
+    [
+        Input("get-new-info-button", "n_clicks"),
+        Input("replay-interval", "n_intervals"),
+    ],
+    [State("replay-state", "data"), State("feature-dropdown", "value")],
+)
+def replay_tick(n_get_new_info, n_intervals, replay_state, selected_column):
+    if not replay_speedup or n_get_new_info is None:
+        raise dash.exceptions.PreventUpdate
+    triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+    if "get-new-info-button.n_clicks" in triggered or not replay_state:
+        replay_state = {
+            "session": uuid.uuid4().hex,
+            "started": time.time(),
+            "start": replay_start(),
+            "position": replay_start(),
+        }
+        return dash.no_update, replay_state, dash.no_update, False
+
+    position = replay_state["position"]
+    n_rows = rows_due(
+        replay_state["started"],
+        time.time(),
+        replay_speedup,
+        position,
+        replay_state["start"],
+        len(df),
+    )
+    if not n_rows:
+        if position >= len(df):
+            return dash.no_update, dash.no_update, dash.no_update, True
+        raise dash.exceptions.PreventUpdate
+
+    # Only the new rows are read, scored and sent.
+    stream = replay_stream(replay_state["session"], position)
+    rows = df.iloc[position: position + n_rows]
+    with metrics.stage("replay_score"):
+        stream.push(rows[list(df_button)].to_numpy(dtype="float64"))
+    if selected_column not in list(df_button):
+        selected_column = "WEC: ava. windspeed"
+    extend = {
+        "x": [rows.index.astype(str).tolist()],
+        "y": [rows[selected_column].tolist()],
+        "customdata": [
+            np.round(gauge_lookup.values[position: position + n_rows], 2).tolist()
+        ],
+    }
+    replay_state = dict(replay_state, position=position + n_rows)
+    live_rul = {
+        "rul": stream.rul(),
+        "info": "Live replay: RUL is estimated from the readings of the last week"
+        " up to " + str(rows.index[-1]),
+    }
+    return [extend, [0], 2 * target_points], replay_state, live_rul, False
+
+
+@server.route("/api/rul", methods=["POST"])
+def score_rul():
+    sync_new_data()
+    try:
+        windows = parse_windows(
+            request.content_type or "",
+            request.get_data(),
+            x_test.columns,
+            list(df_button),
         )
-    else:
-        value_active_power = 0
-        value_active_power_wind = 0
-        value_reactive_power = 0
-        value_wind_speed = 0
-        value_blade_angle = 0
-        return (
-            value_active_power,
-            value_active_power_wind,
-            value_wind_speed,
-            value_reactive_power,
-            value_blade_angle,
+    except ScoringError as e:
+        return jsonify(error=str(e)), 400
+    model = model_registry.get()
+    rul, _ = score_windows(model, windows, x_test.columns)
+    return jsonify(model_version=model.version, rul=rul)
+
+
+@server.route("/api/new-data", methods=["POST"])
+def post_new_data():
+    try:
+        scada_rows, status_events = parse_new_data(
+            request.get_json(silent=True), list(df_button)
         )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    append_new_data(scada_rows, status_events)
+    return jsonify(version=applied_appends, rows=len(df))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+MISSING = "missing"
+
+JOB_DIR = "data/.jobs"
+JOB_TTL = 3600.0
+
+
+def job_id(key):
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+
+class MemoryJobStore:
+    # Job states of this process only; finished jobs are kept up to maxsize.
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, job, retry=False):
+        # True if the caller should run the job: it is unknown, or it has
+        # failed and the caller asks for a retry.
+        with self._lock:
+            state, _ = self._jobs.get(job, (MISSING, None))
+            if not (state == MISSING or retry and state == FAILED):
+                return False
+            self._jobs[job] = (PENDING, None)
+            self._trim()
+            return True
+
+    def set(self, job, state, result=None):
+        with self._lock:
+            self._jobs[job] = (state, result)
+            self._jobs.move_to_end(job)
+            self._trim()
+
+    def get(self, job):
+        with self._lock:
+            return self._jobs.get(job, (MISSING, None))
+
+    def _trim(self):
+        while len(self._jobs) > self.maxsize:
+            oldest = next(iter(self._jobs))
+            if self._jobs[oldest][0] in (PENDING, RUNNING):
+                break
+            self._jobs.popitem(last=False)
+
+
+class FileJobStore:
+    # Local stand-in for a broker's result backend: states live in a directory
+    # that every gunicorn worker sees, so a poll can land on any worker and a
+    # job claimed by one worker is not started again by another. A claim whose
+    # worker died is taken over after stale_after seconds; files older than
+    # ttl are removed now and then.
+
+    def __init__(self, directory=JOB_DIR, stale_after=300.0, ttl=JOB_TTL):
+        self.directory = directory
+        self.stale_after = stale_after
+        self.ttl = max(ttl, stale_after)
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job, suffix):
+        return os.path.join(self.directory, f"{job}.{suffix}")
+
+    def claim(self, job, retry=False):
+        state, _ = self.get(job)
+        if not (state == MISSING or retry and state == FAILED):
+            return False
+        marker = self._path(job, "claim")
+        if state == FAILED or self._stale(marker):
+            for path in (marker, self._path(job, "result")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    def _stale(self, marker):
+        try:
+            return time.time() - os.path.getmtime(marker) > self.stale_after
+        except FileNotFoundError:
+            return False
+
+    def set(self, job, state, result=None):
+        if state in (PENDING, RUNNING):
+            os.utime(self._path(job, "claim"))
+            return
+        tmp = self._path(job, f"{uuid.uuid4().hex}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump((state, result), f)
+        os.replace(tmp, self._path(job, "result"))
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self._prune()
+
+    def _prune(self):
+        # Finished results, dead claims and leftover temporary files alike.
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, job):
+        try:
+            with open(self._path(job, "result"), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        marker = self._path(job, "claim")
+        if os.path.exists(marker) and not self._stale(marker):
+            return RUNNING, None
+        return MISSING, None
+
+
+def _run(store, job, fn, args, finish):
+    store.set(job, RUNNING)
+    try:
+        result = fn(*args)
+        store.set(job, DONE, result if finish is None else finish(result))
+    except Exception as e:
+        store.set(job, FAILED, repr(e))
+
+
+class JobQueue:
+    # Runs slow work off the request thread. Jobs are identified by a key, so
+    # submitting the same key while it is queued, running or done returns the
+    # existing job instead of starting a duplicate. A failed job stays failed
+    # until it is submitted again with retry=True. With executor="process"
+    # the function and its arguments must be picklable, and the job runs in a
+    # pool process; finish, if given, is applied to the result back in this
+    # process before it is stored, e.g. to fill a cache here.
+
+    def __init__(self, store=None, executor="thread", max_workers=None):
+        self.store = store if store is not None else MemoryJobStore()
+        pool = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        self._pool = pool(max_workers=max_workers)
+        self._process = executor == "process"
+
+    def submit(self, key, fn, *args, finish=None, retry=False):
+        job = job_id(key)
+        if self.store.claim(job, retry):
+            if self._process:
+                future = self._pool.submit(fn, *args)
+                future.add_done_callback(lambda f: self._finished(job, f, finish))
+            else:
+                self._pool.submit(_run, self.store, job, fn, args, finish)
+        return job
+
+    def _finished(self, job, future, finish):
+        try:
+            result = future.result()
+            self.store.set(job, DONE, result if finish is None else finish(result))
+        except Exception as e:
+            self.store.set(job, FAILED, repr(e))
+
+    def status(self, job):
+        return self.store.get(job)
+
+
+def job_queue_from_env():
+    store = None
+    if os.environ.get("JOB_STORE") == "file":
+        store = FileJobStore(ttl=float(os.environ.get("JOB_TTL", JOB_TTL)))
+    workers = os.environ.get("JOB_WORKERS")
+    return JobQueue(
+        store,
+        executor=os.environ.get("JOB_EXECUTOR", "thread"),
+        max_workers=int(workers) if workers else None,
+    )
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import resource
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+import data_preprocessing as dp
+from data_cache import cached_preprocess_scada
+from train import fit, mae, rmse
+
+FOLDS = 12
+TEST_PERIOD = "7D"
+MIN_TRAIN_PERIOD = "30D"
+# A fault counts as caught if, within this many days before it, the predicted
+# RUL drops to this many days or fewer.
+WARNING_DAYS = 3
+
+DEFAULT_PARAMS = {
+    "max_depth": 10,
+    "learning_rate": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "colsample_bylevel": 1.0,
+    "min_child_weight": 1.0,
+    "gamma": 0,
+    "reg_lambda": 1.0,
+    "n_estimators": 100,
+}
+
+_data = {}
+
+
+def load_history(row_limit=None, timesteps=dp.TIMESTEPS, compact=False):
+    # The whole labelled history as lag windows, not just the train/test split
+    # the dashboard uses. RUL is the last column; it is only the label here,
+    # so the windows are built over the sensor columns alone (one copy).
+    index, _, values, target = cached_preprocess_scada(
+        row_limit=row_limit, compact=compact, mmap_mode="r"
+    )
+    x = dp.lag_features(values[:, :-1], timesteps)
+    return index[: len(x)], x, target[: len(x)]
+
+
+def walk_forward_folds(
+    index,
+    folds=FOLDS,
+    test_period=TEST_PERIOD,
+    min_train_period=MIN_TRAIN_PERIOD,
+    window=None,
+):
+    # The last `folds` test periods of the history, each scored by a model
+    # trained on everything before it, or only on the preceding `window`.
+    # Returned as (train_start, test_start, test_end) row positions.
+    test_period = pd.Timedelta(test_period)
+    starts = pd.DatetimeIndex(
+        [index[-1] - test_period * k for k in range(folds, 0, -1)]
+    )
+    starts = starts[starts >= index[0] + pd.Timedelta(min_train_period)]
+    test_start = np.searchsorted(index.values, starts.values, side="right")
+    test_end = np.searchsorted(
+        index.values, (starts + test_period).values, side="right"
+    )
+    if window is None:
+        train_start = np.zeros_like(test_start)
+    else:
+        train_start = np.searchsorted(
+            index.values, (starts - pd.Timedelta(window)).values, side="right"
+        )
+    return [
+        (int(a), int(b), int(c))
+        for a, b, c in zip(train_start, test_start, test_end)
+        if c > b > a
+    ]
+
+
+def purge(index, y, fold_rows, timesteps=dp.TIMESTEPS):
+    # Ends each fold's training where nothing it learns from depends on the
+    # test period: no lag window may reach into the test rows, and every label
+    # must count down to a fault that happened before the test period starts.
+    # RUL is floored to whole days, so a row's fault is less than RUL + 1 days
+    # after it. Returned as (train_start, train_end, test_start, test_end).
+    times = index.values
+    fault_by = times + (np.asarray(y, dtype="int64") + 1) * np.timedelta64(1, "D")
+    purged = []
+    for train_start, test_start, test_end in fold_rows:
+        train_end = max(test_start - timesteps, 0)
+        unknown = np.flatnonzero(fault_by[train_start:train_end] > times[test_start])
+        if len(unknown):
+            train_end = train_start + int(unknown[0])
+        if train_end > train_start:
+            purged.append((train_start, train_end, test_start, test_end))
+    return purged
+
+
+def warning_rates(y_true, y_pred, warning_days=WARNING_DAYS):
+    # Faults are where the actual RUL jumps up again; rows before a fault
+    # within warning_days form its warning zone. A fault is caught if any
+    # prediction in its zone is at most warning_days, and every other such
+    # prediction is a false alarm.
+    y_true = np.asarray(y_true)
+    alarm = np.asarray(y_pred) <= warning_days
+    segment = np.concatenate([[0], np.cumsum(np.diff(y_true) > 0)])
+    zone = y_true <= warning_days
+    zone_segments = np.unique(segment[zone])
+    caught = np.bincount(segment[zone & alarm], minlength=segment[-1] + 1) > 0
+    quiet = ~zone
+    return {
+        "faults": len(zone_segments),
+        "hit_rate": caught[zone_segments].mean() if len(zone_segments) else np.nan,
+        "false_alarm_rate": alarm[quiet].mean() if quiet.any() else np.nan,
+    }
+
+
+def _init_worker(row_limit, timesteps, compact):
+    _data["history"] = load_history(row_limit, timesteps, compact)
+
+
+def _run_fold(args):
+    fold, rows, params, warning_days, nthread = args
+    train_start, train_end, test_start, test_end = rows
+    start = time.perf_counter()
+    index, x, y = _data["history"]
+    booster = fit(params, x[train_start:train_end], y[train_start:train_end], nthread)
+    y_pred = booster.predict(
+        xgb.DMatrix(np.asarray(x[test_start:test_end], dtype="float32"))
+    )
+    y_true = y[test_start:test_end]
+    result = {
+        "fold": fold,
+        "test_from": str(index[test_start]),
+        "test_to": str(index[test_end - 1]),
+        "train_rows": train_end - train_start,
+        "purged_rows": test_start - train_end,
+        "test_rows": test_end - test_start,
+        "rmse": rmse(y_true, y_pred),
+        "mae": mae(y_true, y_pred),
+    }
+    result.update(warning_rates(y_true, y_pred, warning_days))
+    result["seconds"] = time.perf_counter() - start
+    # Every fold runs in a fresh process, so this is the fold's own peak.
+    result["peak_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def backtest(
+    params=DEFAULT_PARAMS,
+    folds=FOLDS,
+    test_period=TEST_PERIOD,
+    min_train_period=MIN_TRAIN_PERIOD,
+    window=None,
+    warning_days=WARNING_DAYS,
+    row_limit=None,
+    timesteps=dp.TIMESTEPS,
+    compact=False,
+    n_jobs=-1,
+):
+    index, _, y = load_history(row_limit, timesteps, compact)
+    fold_rows = purge(
+        index,
+        y,
+        walk_forward_folds(index, folds, test_period, min_train_period, window),
+        timesteps,
+    )
+    if not fold_rows:
+        raise ValueError("history too short for the requested folds")
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    workers = min(n_jobs, len(fold_rows))
+    nthread = max(n_jobs // workers, 1)
+    tasks = [
+        (i, rows, params, warning_days, nthread) for i, rows in enumerate(fold_rows)
+    ]
+    with Pool(
+        workers,
+        initializer=_init_worker,
+        initargs=(row_limit, timesteps, compact),
+        maxtasksperchild=1,
+    ) as pool:
+        results = list(pool.imap_unordered(_run_fold, tasks))
+    return pd.DataFrame(results).set_index("fold").sort_index()
+
+
+def load_params(path):
+    # A plain params dict, or train.py's metrics file with one under "params".
+    with open(path) as f:
+        params = json.load(f)
+    return params.get("params", params)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward RUL backtest")
+    parser.add_argument("--params", help="JSON file with XGBoost parameters")
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--test-period", default=TEST_PERIOD)
+    parser.add_argument("--min-train-period", default=MIN_TRAIN_PERIOD)
+    parser.add_argument(
+        "--window", help="train on this much history only, e.g. 90D (default: all)"
+    )
+    parser.add_argument("--warning-days", type=float, default=WARNING_DAYS)
+    parser.add_argument("--row-limit", type=int, help="labelled rows, 0 for all")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--out", help="also write the per-fold results as CSV")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = backtest(
+        load_params(args.params) if args.params else DEFAULT_PARAMS,
+        args.folds,
+        args.test_period,
+        args.min_train_period,
+        args.window,
+        args.warning_days,
+        args.row_limit or None,
+        compact=args.compact,
+        n_jobs=args.n_jobs,
+    )
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(results.round(3))
+    print(
+        f"mean rmse {results['rmse'].mean():.3f}  mae {results['mae'].mean():.3f}  "
+        f"hit rate {results['hit_rate'].mean():.3f}  "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    if args.out:
+        results.to_csv(args.out)
@@ -0,0 +1,108 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+import data_preprocessing as dp
+from prediction_cache import estimate_rul
+
+NPY_CONTENT_TYPE = "application/x-npy"
+
+
+class ScoringError(ValueError):
+    pass
+
+
+def _lag_rows(window, n_columns):
+    try:
+        window = np.asarray(window, dtype="float64")
+    except (TypeError, ValueError) as e:
+        raise ScoringError(f"windows must hold numbers: {e}")
+    if window.ndim == 1:
+        window = window[np.newaxis, :]
+    if window.ndim != 2 or window.shape[1] != n_columns or len(window) == 0:
+        raise ScoringError(
+            f"each window must be one or more lag rows of {n_columns} values"
+        )
+    return window
+
+
+def _rows_to_lag(records, features, timesteps):
+    # Processed-feature rows (the columns of df); the two inverter aggregates
+    # are derived when the raw cabinet temperatures are sent instead. RUL, the
+    # last feature, is what is being estimated: it is not required, and like
+    # the open rows of incremental_preprocessing it is scored as missing.
+    if not isinstance(records, list) or not all(
+        isinstance(record, dict) for record in records
+    ):
+        raise ScoringError("each window must be a list of row objects")
+    rows = pd.DataFrame.from_records(records)
+    if set(dp.INVERTER_TEMP_COLUMNS) <= set(rows.columns):
+        try:
+            rows[dp.INVERTER_TEMP_COLUMNS] = rows[dp.INVERTER_TEMP_COLUMNS].astype(
+                "float64"
+            )
+        except (TypeError, ValueError) as e:
+            raise ScoringError(f"rows must hold numbers: {e}")
+        rows = dp.add_inverter_features(rows)
+    sensors = list(features[:-1])
+    missing = [c for c in sensors if c not in rows.columns]
+    if missing:
+        raise ScoringError(f"rows are missing columns: {missing}")
+    if len(rows) <= timesteps:
+        raise ScoringError(f"each window needs more than {timesteps} rows")
+    values = np.full((len(rows), len(features)), np.nan)
+    try:
+        values[:, :-1] = rows[sensors].values.astype("float64")
+    except (TypeError, ValueError) as e:
+        raise ScoringError(f"rows must hold numbers: {e}")
+    return dp.lag_features(values, timesteps)
+
+
+def parse_windows(content_type, body, columns, features, timesteps=dp.TIMESTEPS):
+    # Accepted bodies:
+    #   application/x-npy: a (windows, rows, columns) or (rows, columns) array
+    #     of lag rows; in the 2-D case every row is its own window.
+    #   JSON {"windows": [...]}: each window a lag row or a list of lag rows.
+    #   JSON {"rows": [...]}: each window a list of SCADA row records.
+    n_columns = len(columns)
+    if content_type.startswith(NPY_CONTENT_TYPE):
+        try:
+            array = np.load(io.BytesIO(body), allow_pickle=False)
+        except ValueError as e:
+            raise ScoringError(f"invalid npy body: {e}")
+        if array.ndim == 2:
+            array = array[:, np.newaxis, :]
+        if array.ndim != 3:
+            raise ScoringError("npy body must be 2-D or 3-D")
+        return [_lag_rows(window, n_columns) for window in array]
+
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise ScoringError(f"invalid JSON body: {e}")
+    if not isinstance(payload, dict):
+        raise ScoringError('expected an object with "windows" or "rows"')
+    if "windows" in payload:
+        if not isinstance(payload["windows"], list):
+            raise ScoringError('"windows" must be a list')
+        return [_lag_rows(window, n_columns) for window in payload["windows"]]
+    if "rows" in payload:
+        if not isinstance(payload["rows"], list):
+            raise ScoringError('"rows" must be a list')
+        return [_rows_to_lag(rows, features, timesteps) for rows in payload["rows"]]
+    raise ScoringError('expected an object with "windows" or "rows"')
+
+
+def score_windows(model, windows, columns):
+    # One predict call over the lag rows of every window; the per-window RUL
+    # is then reduced the same way the dashboard reduces x_test.
+    if not windows:
+        return [], np.empty(0)
+    lengths = np.array([len(window) for window in windows])
+    x = pd.DataFrame(np.concatenate(windows), columns=columns, copy=False)
+    y_pred = np.asarray(model.predict(x))
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    rul = [estimate_rul(peak) for peak in np.maximum.reduceat(y_pred, starts)]
+    return rul, y_pred
@@ -0,0 +1,426 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_preprocessing as dp
+import streaming_preprocessing as sp
+from backtest import DEFAULT_PARAMS
+from data_cache import cached_preprocess_scada
+from model_registry import load_model, registry
+from rul_timeline import TIMELINE_CHUNKSIZE, predict_timeline
+from synthetic_data import write_synthetic
+from train import fit
+
+SIZES = (10000, 1000000, 10000000)
+WORK_DIR = "data/.bench"
+BASELINE_PATH = "benchmarks/baseline.json"
+IN_MEMORY_LIMIT = 2000000
+MODEL_ROWS = 10000
+REPEATS = 3
+TOLERANCE = 0.5
+NOISE_FLOOR = 0.005  # seconds; smaller differences are never regressions
+WEEK = 7 * 144
+CALLBACK_PATH = "/_dash-update-component"
+UPDATE_GRAPH_OUTPUTS = [
+    ("Main-Graph", "figure"),
+    ("rul-estimation-indicator-led", "value"),
+    ("Info-Textbox", "value"),
+    ("job-poll-interval", "disabled"),
+]
+
+
+def parse_size(text):
+    scale = {"k": 10 ** 3, "m": 10 ** 6}.get(text[-1].lower())
+    return int(float(text[:-1]) * scale) if scale else int(text)
+
+
+def update_graph_body(
+    column="WEC: ava. windspeed",
+    start_date=None,
+    end_date=None,
+    n_get_new_info=None,
+    n_pred=None,
+    n_intervals=None,
+    relayout_data=None,
+    changed="feature-dropdown.value",
+):
+    # The request the Dash renderer sends for update_graph when `changed`
+    # fires, or on page load without it; loadtest.py sends the same bodies.
+    inputs = [
+        ("feature-dropdown", "value", column),
+        ("date-picker", "start_date", start_date),
+        ("date-picker", "end_date", end_date),
+        ("get-new-info-button", "n_clicks", n_get_new_info),
+        ("predict-button", "n_clicks", n_pred),
+        ("job-poll-interval", "n_intervals", n_intervals),
+        ("Main-Graph", "relayoutData", relayout_data),
+        ("live-rul", "data", None),
+    ]
+    return {
+        "output": ".."
+        + "...".join(f"{id}.{prop}" for id, prop in UPDATE_GRAPH_OUTPUTS)
+        + "..",
+        "outputs": [{"id": id, "property": prop} for id, prop in UPDATE_GRAPH_OUTPUTS],
+        "inputs": [
+            {"id": id, "property": prop, "value": value} for id, prop, value in inputs
+        ],
+        "changedPropIds": [changed] if changed else [],
+        "state": [{"id": "replay-state", "property": "data", "value": None}],
+    }
+
+
+def _time(fn, repeats=1):
+    # Best of repeats, in seconds, and the last result.
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def materialize_lags(values, timesteps=dp.TIMESTEPS, chunksize=TIMELINE_CHUNKSIZE):
+    # Lag windows are views; this is the copy the model input gets, chunk by
+    # chunk as rul_timeline scores them.
+    windows = dp.lag_features(values, timesteps)
+    for start in range(0, len(windows), chunksize):
+        np.ascontiguousarray(windows[start: start + chunksize], dtype="float32")
+    return len(windows)
+
+
+def preprocessing_stages(scada_path, status_path, repeats):
+    # dp.preprocess_scada step by step, then as a whole.
+    timings = {}
+
+    def stage(name, fn):
+        timings[name], result = _time(fn, repeats)
+        return result
+
+    df = stage("read_scada", lambda: pd.read_csv(scada_path))
+    status = stage("read_status", lambda: pd.read_csv(status_path))
+    df = stage("add_inverter_features", lambda: dp.add_inverter_features(df))
+    df["Time"] = stage("parse_time", lambda: dp.parse_time(df["Time"]))
+    df = stage("sort", lambda: df.sort_values("Time").reset_index(drop=True))
+    faults = stage("fault_times", lambda: dp.fault_times(status))
+    fault = stage("label_faults", lambda: dp.label_faults(df["Time"].values, faults))
+    stage("compute_rul", lambda: dp.compute_rul(df["Time"].values, fault))
+    del df, status
+    timings["preprocess_scada"], processed = _time(
+        lambda: dp.preprocess_scada(scada_path, status_path, row_limit=None)
+    )
+    return timings, processed
+
+
+def benchmark_model(work_dir=WORK_DIR, n_rows=MODEL_ROWS):
+    # MODEL_PATH if set; otherwise backtest.DEFAULT_PARAMS fitted on n_rows of
+    # seed-0 synthetic data, so the baseline needs nothing outside this
+    # checkout. Trained once and kept under work_dir.
+    if os.environ.get("MODEL_PATH"):
+        return os.path.abspath(os.environ["MODEL_PATH"])
+    model_dir = os.path.join(work_dir, "model")
+    path = os.path.abspath(os.path.join(model_dir, "xgb_reg.json"))
+    if os.path.exists(path):
+        return path
+    data_dir = os.path.join(model_dir, "data")
+    write_synthetic(data_dir, n_rows, overwrite=True)
+    df, _, _, _, x_train = dp.data_preprocessing(
+        os.path.join(data_dir, os.path.basename(dp.SCADA_PATH)),
+        os.path.join(data_dir, os.path.basename(dp.STATUS_PATH)),
+        row_limit=None,
+    )
+    y_train = df["RUL"].values[: len(x_train)]
+    booster = fit(DEFAULT_PARAMS, x_train.values, y_train, os.cpu_count())
+    # xgboost picks the format from the extension, so the scratch name keeps it.
+    tmp = os.path.join(model_dir, "xgb_reg.tmp.json")
+    booster.save_model(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def cache_stages(scada_path, status_path, cache_dir, repeats, chunksize=None):
+    # A cold data_cache build, streamed when chunksize is set, then the
+    # memory-mapped load every later start and worker does.
+    timings = {}
+
+    def build():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return cached_preprocess_scada(
+            scada_path,
+            status_path,
+            row_limit=None,
+            cache_dir=cache_dir,
+            chunksize=chunksize,
+            mmap_mode="r",
+        )
+
+    timings["cache_build"], _ = _time(build)
+    timings["cache_load"], _ = _time(
+        lambda: cached_preprocess_scada(
+            scada_path, status_path, row_limit=None, cache_dir=cache_dir, mmap_mode="r"
+        ),
+        repeats,
+    )
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return timings
+
+
+def model_stages(processed, repeats, model_path):
+    timings = {}
+    index, features, values = processed
+    timings["lag_features"], _ = _time(lambda: materialize_lags(values), repeats)
+    timings["build_frames"], frames = _time(
+        lambda: dp.build_frames(index, features, values), repeats
+    )
+    df, _, x_test, _, x_train = frames
+    timings["model_load"], _ = _time(lambda: load_model("benchmark", model_path))
+    registry.register("benchmark", model_path)
+    model = registry.get("benchmark")
+    timings["predict_week"], _ = _time(
+        lambda: model.predict(x_test.iloc[-WEEK:]), repeats
+    )
+    timings["predict_timeline"], _ = _time(
+        lambda: predict_timeline(model, len(df), (x_train, x_test))
+    )
+    return timings
+
+
+def callback_stages(repeats):
+    # Runs inside the benchmark's data directory (see run_callbacks): the app
+    # preprocesses, scores and indexes the whole history on import.
+    timings = {}
+    timings["app_startup"], app = _time(lambda: __import__("app"))
+    client = app.server.test_client()
+    df = app.df
+
+    def post(body):
+        response = client.post(CALLBACK_PATH, json=body)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"{response.status_code}: {response.data[:200]}")
+        return response
+
+    month = (str(df.index[-1] - pd.Timedelta("30D")), str(df.index[-1]))
+    middle = df.index[len(df) // 2]
+    zoom = {
+        "xaxis.range[0]": str(middle),
+        "xaxis.range[1]": str(middle + pd.Timedelta("2D")),
+    }
+    requests = {
+        "feature_switch": update_graph_body("WEC: ava. Power"),
+        "date_range": update_graph_body(
+            "WEC: ava. Power", *month, changed="date-picker.end_date"
+        ),
+        "zoom": update_graph_body(
+            "WEC: ava. Power", relayout_data=zoom, changed="Main-Graph.relayoutData"
+        ),
+        "get_new_data": update_graph_body(
+            n_get_new_info=1, changed="get-new-info-button.n_clicks"
+        ),
+    }
+    for name, body in requests.items():
+
+        def cold():
+            app.figure_cache.clear()
+            return post(body)
+
+        timings[f"callback_{name}"], _ = _time(cold, repeats)
+        timings[f"callback_{name}_cached"], _ = _time(lambda: post(body), repeats)
+
+    # 'Predict' returns at once; the result arrives on a later poll.
+    def predict():
+        post(
+            update_graph_body(
+                n_get_new_info=1, n_pred=1, changed="predict-button.n_clicks"
+            )
+        )
+        poll = update_graph_body(
+            n_get_new_info=1,
+            n_pred=1,
+            n_intervals=1,
+            changed="job-poll-interval.n_intervals",
+        )
+        while True:
+            response = json.loads(post(poll).data)["response"]
+            if response["job-poll-interval"]["disabled"]:
+                break
+            time.sleep(0.001)
+        info = response["Info-Textbox"]["value"]
+        if info.startswith("RUL estimation failed"):
+            raise RuntimeError(info)
+
+    timings["callback_predict"], _ = _time(predict)
+    timings["callback_predict_cached"], _ = _time(predict, repeats)
+    return timings
+
+
+def run_callbacks(size_dir, repeats, model_path):
+    # The app reads data/ relative to the working directory and keeps module
+    # state, so it is benchmarked in a fresh process per size, from a cold
+    # preprocessing cache.
+    shutil.rmtree(os.path.join(size_dir, "data", ".cache"), ignore_errors=True)
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(
+        os.environ,
+        ROW_LIMIT="0",
+        PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])),
+    )
+    env["MODEL_PATH"] = model_path
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--callbacks-only"]
+        + ["--repeats", str(repeats)],
+        cwd=size_dir,
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(
+    sizes=SIZES,
+    work_dir=WORK_DIR,
+    repeats=REPEATS,
+    in_memory_limit=IN_MEMORY_LIMIT,
+    callbacks=True,
+):
+    model_path = benchmark_model(work_dir)
+    results = {}
+    for n_rows in sizes:
+        size_dir = os.path.join(work_dir, str(n_rows))
+        data_dir = os.path.join(size_dir, "data")
+        scada_path = os.path.join(data_dir, os.path.basename(dp.SCADA_PATH))
+        status_path = os.path.join(data_dir, os.path.basename(dp.STATUS_PATH))
+        if not os.path.exists(status_path):
+            print(f"generating {n_rows} rows in {data_dir}", flush=True)
+            write_synthetic(data_dir, n_rows, overwrite=True)
+
+        timings = {}
+        n_repeats = repeats if n_rows < in_memory_limit else 1
+        out_dir = os.path.join(size_dir, "streaming")
+        os.makedirs(out_dir, exist_ok=True)
+        timings["streaming_preprocess_scada"], processed = _time(
+            lambda: sp.streaming_preprocess_scada(
+                scada_path, status_path, row_limit=None, out_dir=out_dir
+            )
+        )
+        in_memory = n_rows <= in_memory_limit
+        if in_memory:
+            stages, processed = preprocessing_stages(
+                scada_path, status_path, n_repeats
+            )
+            timings.update(stages)
+        timings.update(
+            cache_stages(
+                scada_path,
+                status_path,
+                os.path.join(size_dir, "cache"),
+                n_repeats,
+                None if in_memory else sp.CHUNKSIZE,
+            )
+        )
+        timings.update(model_stages(processed, n_repeats, model_path))
+        del processed
+        # The app preprocesses in memory on a cold start.
+        if callbacks and in_memory:
+            timings.update(run_callbacks(size_dir, n_repeats, model_path))
+        results[str(n_rows)] = timings
+        print(f"{n_rows} rows", flush=True)
+        for name, seconds in timings.items():
+            print(f"  {name:<36} {seconds * 1e3:12.2f} ms", flush=True)
+    return results
+
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "model": os.environ.get(
+            "MODEL_PATH", f"DEFAULT_PARAMS on {MODEL_ROWS} synthetic rows"
+        ),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Stages slower than the baseline by more than tolerance (and by more
+    # than the noise floor), as (size, stage, seconds, baseline seconds).
+    regressions = []
+    for size, timings in results.items():
+        for name, seconds in timings.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = seconds / before if before else float("inf")
+            flag = ""
+            if ratio > 1 + tolerance and seconds - before > NOISE_FLOOR:
+                regressions.append((size, name, seconds, before))
+                flag = "  REGRESSION"
+            print(f"{size:>9} {name:<36} {ratio:6.2f}x baseline{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Preprocessing, model and callback timings on synthetic data"
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SIZES),
+        help="comma-separated row counts, e.g. 10k,1M,10M",
+    )
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument(
+        "--in-memory-limit",
+        type=int,
+        default=IN_MEMORY_LIMIT,
+        help="larger sizes only run the streaming preprocessing path",
+    )
+    parser.add_argument("--skip-callbacks", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="merge these timings into the baseline instead of comparing",
+    )
+    parser.add_argument("--callbacks-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.callbacks_only:
+        print(json.dumps(callback_stages(args.repeats)))
+        sys.exit(0)
+
+    results = run(
+        [parse_size(size) for size in args.sizes.split(",")],
+        args.work_dir,
+        args.repeats,
+        args.in_memory_limit,
+        not args.skip_callbacks,
+    )
+    baseline = {"machine": None, "results": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.save_baseline:
+        baseline["machine"] = machine()
+        baseline["results"].update(results)
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+    elif baseline["results"]:
+        print(f"compared with {args.baseline} from {baseline['machine']}")
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import data_preprocessing as dp
+import streaming_preprocessing as sp
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent first starts may each build the entry
+    fcntl = None
+
+CACHE_DIR = "data/.cache"
+CACHE_VERSION = 3
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint(paths, params, cache_dir=CACHE_DIR):
+    # The key covers the raw inputs, the preprocessing parameters and the
+    # preprocessing code itself, so editing any of them invalidates the cache.
+    # File digests are remembered in cache_dir/digests.json by path, size and
+    # mtime, so a worker start only stats the inputs; a file is read again
+    # once its stat changes.
+    digests_path = os.path.join(cache_dir, "digests.json")
+    try:
+        with open(digests_path) as f:
+            digests = json.load(f)
+    except (OSError, ValueError):
+        digests = {}
+    changed = False
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps({"version": CACHE_VERSION, "params": params}, sort_keys=True).encode())
+    for path in list(paths) + [dp.__file__, sp.__file__]:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        stat = [st.st_size, st.st_mtime_ns]
+        entry = digests.get(key)
+        if entry is None or entry["stat"] != stat:
+            entry = digests[key] = {"stat": stat, "digest": file_digest(path)}
+            changed = True
+        h.update(entry["digest"].encode())
+    if changed:
+        tmp = f"{digests_path}.tmp-{uuid.uuid4().hex}"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(digests, f)
+            os.replace(tmp, digests_path)
+        except OSError:  # read-only cache dir: hash again next start
+            pass
+    return h.hexdigest()
+
+
+@contextmanager
+def build_lock(cache_dir):
+    # Serialises the first build across gunicorn workers, so only one of them
+    # parses the CSVs and the rest wait and load its result.
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(cache_dir, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def save_processed(
+    directory, index, features, values, params=None, compact=False, scratch=None
+):
+    # Only the (rows, features) array, its integer target column and the time
+    # index are stored, already in the dtypes build_frames() uses, so a
+    # memory-mapped load needs no conversion. The lag frames are views rebuilt
+    # on load, so the entry does not depend on timesteps. Written to a scratch
+    # directory and renamed into place, so concurrent workers never see a
+    # half-written entry. A caller passing scratch has already written values
+    # there as values.npy, in the entry's dtype.
+    dtypes = dp.COMPACT_DTYPES if compact else dp.DEFAULT_DTYPES
+    tmp = scratch or f"{directory}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp, exist_ok=True)
+    try:
+        np.save(os.path.join(tmp, "index.npy"), np.asarray(index.values))
+        if scratch is None:
+            np.save(
+                os.path.join(tmp, "values.npy"),
+                np.ascontiguousarray(values, dtype=dtypes["values"]),
+            )
+        else:
+            values.flush()
+        np.save(os.path.join(tmp, "target.npy"), values[:, -1].astype(dtypes["target"]))
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump(
+                {"params": params, "index_name": index.name, "features": features}, f
+            )
+        os.replace(tmp, directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_processed(directory, mmap_mode=None):
+    # With mmap_mode="r" every process maps the same files read-only, so the
+    # page cache holds one copy of the data however many workers attach.
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    index = pd.DatetimeIndex(
+        np.load(os.path.join(directory, "index.npy"), mmap_mode=mmap_mode),
+        name=manifest["index_name"],
+    )
+    values = np.load(os.path.join(directory, "values.npy"), mmap_mode=mmap_mode)
+    target = np.load(os.path.join(directory, "target.npy"), mmap_mode=mmap_mode)
+    return index, manifest["features"], values, target
+
+
+def cache_entry(
+    scada_path=dp.SCADA_PATH,
+    status_path=dp.STATUS_PATH,
+    fault_codes=dp.FAULT_CODES,
+    row_limit=dp.ROW_LIMIT,
+    compact=False,
+    cache_dir=CACHE_DIR,
+):
+    # Directory of the entry for these inputs and settings, and its params.
+    params = {
+        "fault_codes": sorted(fault_codes),
+        "row_limit": row_limit,
+        "compact": compact,
+    }
+    key = fingerprint([scada_path, status_path], params, cache_dir)
+    directory = os.path.join(cache_dir, key)
+    return directory, params
+
+
+class AppendLog:
+    # SCADA rows and status events appended after a cache entry was built, one
+    # pickle per append under the entry's appends/ directory. Every worker
+    # serving the entry replays the log in order, so its length is the shared
+    # data version, and appends survive a restart until the CSVs change.
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _names(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.endswith(".pkl"))
+
+    def __len__(self):
+        return len(self._names())
+
+    def read(self, start=0):
+        for name in self._names()[start:]:
+            entry = pd.read_pickle(os.path.join(self.directory, name))
+            yield entry["scada_rows"], entry["status_events"]
+
+    def write(self, scada_rows=None, status_events=None):
+        os.makedirs(self.directory, exist_ok=True)
+        with build_lock(self.directory):
+            path = os.path.join(self.directory, f"{len(self):08d}.pkl")
+            tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+            pd.to_pickle(
+                {"scada_rows": scada_rows, "status_events": status_events}, tmp
+            )
+            os.replace(tmp, path)
+
+
+def cached_preprocess_scada(
+    scada_path=dp.SCADA_PATH,
+    status_path=dp.STATUS_PATH,
+    fault_codes=dp.FAULT_CODES,
+    row_limit=dp.ROW_LIMIT,
+    cache_dir=CACHE_DIR,
+    chunksize=None,
+    compact=False,
+    mmap_mode=None,
+):
+    directory, params = cache_entry(
+        scada_path, status_path, fault_codes, row_limit, compact, cache_dir
+    )
+    manifest = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest):
+        return load_processed(directory, mmap_mode)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with build_lock(cache_dir):
+        if not os.path.exists(manifest):
+            if chunksize is None:
+                processed = dp.preprocess_scada(
+                    scada_path, status_path, fault_codes, row_limit
+                )
+                save_processed(directory, *processed, params=params, compact=compact)
+            else:
+                # Streamed straight into a memory-mapped values.npy in the
+                # scratch entry, so the rows are never held in memory.
+                dtypes = dp.COMPACT_DTYPES if compact else dp.DEFAULT_DTYPES
+                scratch = f"{directory}.tmp-{uuid.uuid4().hex}"
+                os.makedirs(scratch)
+                try:
+                    processed = sp.streaming_preprocess_scada(
+                        scada_path,
+                        status_path,
+                        fault_codes,
+                        row_limit,
+                        chunksize,
+                        out_dir=scratch,
+                        dtype=dtypes["values"],
+                    )
+                    save_processed(
+                        directory,
+                        *processed,
+                        params=params,
+                        compact=compact,
+                        scratch=scratch,
+                    )
+                finally:
+                    shutil.rmtree(scratch, ignore_errors=True)
+    return load_processed(directory, mmap_mode)
+
+
+def dataset_settings_from_env():
+    # COMPACT_DTYPES=1 and ROW_LIMIT (0 for the whole labelled history), as the
+    # app reads them; anything warming the cache for the app must use these.
+    row_limit = int(os.environ.get("ROW_LIMIT", dp.ROW_LIMIT)) or None
+    compact = os.environ.get("COMPACT_DTYPES") == "1"
+    return {"row_limit": row_limit, "compact": compact}
+
+
+def cached_data_preprocessing(
+    scada_path=dp.SCADA_PATH,
+    status_path=dp.STATUS_PATH,
+    timesteps=dp.TIMESTEPS,
+    fault_codes=dp.FAULT_CODES,
+    row_limit=dp.ROW_LIMIT,
+    cache_dir=CACHE_DIR,
+    chunksize=None,
+    compact=False,
+    mmap_mode=None,
+):
+    index, features, values, target = cached_preprocess_scada(
+        scada_path,
+        status_path,
+        fault_codes,
+        row_limit,
+        cache_dir,
+        chunksize,
+        compact,
+        mmap_mode,
+    )
+    return dp.build_frames(
+        index, features, values, timesteps, compact=compact, target_values=target
+    )
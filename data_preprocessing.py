@@ -1,124 +1,201 @@
+import math
+
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from numpy.lib.stride_tricks import as_strided
 
 pd.options.mode.chained_assignment = None
 
-
-def data_preprocessing():
-    df = pd.read_csv("data/SCADA_data.csv")
-    status_data_wec = pd.read_csv("data/status_data_wec.csv")
-
-    df["Inverter avg. temp"] = df[
-        [
-            "CS101 : Sys 1 inverter 1 cabinet temp.",
-            "CS101 : Sys 1 inverter 2 cabinet temp.",
-            "CS101 : Sys 1 inverter 3 cabinet temp.",
-            "CS101 : Sys 1 inverter 4 cabinet temp.",
-            "CS101 : Sys 1 inverter 5 cabinet temp.",
-            "CS101 : Sys 1 inverter 6 cabinet temp.",
-            "CS101 : Sys 1 inverter 7 cabinet temp.",
-            "CS101 : Sys 2 inverter 1 cabinet temp.",
-            "CS101 : Sys 2 inverter 2 cabinet temp.",
-            "CS101 : Sys 2 inverter 3 cabinet temp.",
-            "CS101 : Sys 2 inverter 4 cabinet temp.",
-        ]
-    ].mean(axis=1)
-    df["Inverter std. temp"] = df[
-        [
-            "CS101 : Sys 1 inverter 1 cabinet temp.",
-            "CS101 : Sys 1 inverter 2 cabinet temp.",
-            "CS101 : Sys 1 inverter 3 cabinet temp.",
-            "CS101 : Sys 1 inverter 4 cabinet temp.",
-            "CS101 : Sys 1 inverter 5 cabinet temp.",
-            "CS101 : Sys 1 inverter 6 cabinet temp.",
-            "CS101 : Sys 1 inverter 7 cabinet temp.",
-            "CS101 : Sys 2 inverter 1 cabinet temp.",
-            "CS101 : Sys 2 inverter 2 cabinet temp.",
-            "CS101 : Sys 2 inverter 3 cabinet temp.",
-            "CS101 : Sys 2 inverter 4 cabinet temp.",
-        ]
-    ].std(axis=1)
-    df["Time"] = pd.to_datetime(df["Time"], dayfirst=True, errors="coerce")
-    df.sort_values(by="Time", axis=0, inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
+SCADA_PATH = "data/SCADA_data.csv"
+STATUS_PATH = "data/status_data_wec.csv"
+FAULT_CODES = (62, 80, 228, 60, 9)
+TIMESTEPS = 5
+ROW_LIMIT = 39298
+TEST_SIZE = 0.02642894598
+# Timestamp format of the SCADA export; day first.
+TIME_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+# Compact mode: sensors fit in float32 (XGBoost scores in float32 anyway) and
+# RUL in whole days fits in int32.
+COMPACT_DTYPES = {"values": "float32", "target": "int32"}
+DEFAULT_DTYPES = {"values": "float64", "target": "int64"}
+
+INVERTER_TEMP_COLUMNS = [
+    "CS101 : Sys 1 inverter 1 cabinet temp.",
+    "CS101 : Sys 1 inverter 2 cabinet temp.",
+    "CS101 : Sys 1 inverter 3 cabinet temp.",
+    "CS101 : Sys 1 inverter 4 cabinet temp.",
+    "CS101 : Sys 1 inverter 5 cabinet temp.",
+    "CS101 : Sys 1 inverter 6 cabinet temp.",
+    "CS101 : Sys 1 inverter 7 cabinet temp.",
+    "CS101 : Sys 2 inverter 1 cabinet temp.",
+    "CS101 : Sys 2 inverter 2 cabinet temp.",
+    "CS101 : Sys 2 inverter 3 cabinet temp.",
+    "CS101 : Sys 2 inverter 4 cabinet temp.",
+]
+COLS_TO_DROP = ["Fault"] + INVERTER_TEMP_COLUMNS
+
+
+def add_inverter_features(df):
+    df["Inverter avg. temp"] = df[INVERTER_TEMP_COLUMNS].mean(axis=1)
+    df["Inverter std. temp"] = df[INVERTER_TEMP_COLUMNS].std(axis=1)
+    return df
+
+
+def scada_features(columns):
+    # Column order of the processed frame for a raw SCADA header: sensors in
+    # file order, the two derived inverter features, then RUL.
+    features = [c for c in columns if c not in ["Time", "Error"] + COLS_TO_DROP]
+    return features + ["Inverter avg. temp", "Inverter std. temp", "RUL"]
+
+
+def parse_time(times, time_format=TIME_FORMAT):
+    # Parsing with the known format is many times faster than inferring it per
+    # value; only the values it misses fall back to day-first inference.
+    parsed = pd.to_datetime(times, format=time_format, errors="coerce")
+    missed = parsed.isna() & times.notna()
+    if missed.any():
+        parsed[missed] = pd.to_datetime(times[missed], dayfirst=True, errors="coerce")
+    return parsed
+
+
+def label_faults(times, fault_times):
+    # Membership test against the sorted fault timestamps: one binary search per
+    # row instead of a linear scan of the status array. NaT never matches.
+    fault_times = np.sort(fault_times[~np.isnat(fault_times)])
+    if len(fault_times) == 0:
+        return np.zeros(len(times), dtype="int64")
+    pos = np.searchsorted(fault_times, times).clip(max=len(fault_times) - 1)
+    return (fault_times[pos] == times).astype("int64")
+
+
+def compute_rul(times, fault):
+    # RUL of every row up to and including the last fault is the time until the
+    # next fault row, in whole days. Rows after the last fault have no RUL and
+    # are left out, so len(result) is where the frame gets trimmed.
+    fault_rows = np.flatnonzero(fault)
+    if len(fault_rows) == 0:
+        return np.empty(0, dtype="int64")
+    n_rows = fault_rows[-1] + 1
+    next_fault = fault_rows[np.searchsorted(fault_rows, np.arange(n_rows))]
+    rul = times[next_fault] - times[:n_rows]
+    return rul // np.timedelta64(1, "D")
+
+
+def fault_times(status_data_wec, fault_codes=FAULT_CODES):
     af_corr_time_wec_s = status_data_wec.loc[
-        (status_data_wec["Main Status"] == 62)
-        | (status_data_wec["Main Status"] == 80)
-        | (status_data_wec["Main Status"] == 228)
-        | (status_data_wec["Main Status"] == 60)
-        | (status_data_wec["Main Status"] == 9),
-        "Time",
+        status_data_wec["Main Status"].isin(fault_codes), "Time"
     ]
-
     af_corr_time_wec_s = pd.to_datetime(af_corr_time_wec_s)
-    af_corr_time_wes = af_corr_time_wec_s.round("10min")
+    return af_corr_time_wec_s.round("10min").values
 
-    df.rename(columns={"Error": "Fault"}, inplace=True)
-    df["Fault"] = [0] * len(df)
-    for i, d in enumerate(df["Time"]):
-        if d in af_corr_time_wes.values:
-            df["Fault"][i] = 1
-
-    nf_times = []
-    rul = []
-    for i, d in enumerate(df["Fault"]):
-        nf_times.append(df["Time"][i])
-        if d == 1:
-            for j in nf_times:
-                rul.append(df["Time"][i] - j)
-            nf_times = []
-
-    df_trimmed = df.head(len(rul))
-
-    rul_days = [x.days for x in rul]
-    df_trimmed["RUL"] = rul_days
 
-    cols_to_drop = [
-        "Fault",
-        "CS101 : Sys 1 inverter 1 cabinet temp.",
-        "CS101 : Sys 1 inverter 2 cabinet temp.",
-        "CS101 : Sys 1 inverter 3 cabinet temp.",
-        "CS101 : Sys 1 inverter 4 cabinet temp.",
-        "CS101 : Sys 1 inverter 5 cabinet temp.",
-        "CS101 : Sys 1 inverter 6 cabinet temp.",
-        "CS101 : Sys 1 inverter 7 cabinet temp.",
-        "CS101 : Sys 2 inverter 1 cabinet temp.",
-        "CS101 : Sys 2 inverter 2 cabinet temp.",
-        "CS101 : Sys 2 inverter 3 cabinet temp.",
-        "CS101 : Sys 2 inverter 4 cabinet temp.",
+def lag_columns(features, timesteps=TIMESTEPS):
+    return list(features) + [
+        f"{c}_{shift_val}" for shift_val in range(1, timesteps) for c in features
     ]
 
-    for i in cols_to_drop:
-        if i in list(df):
-            df_trimmed.drop(i, axis=1, inplace=True)
 
-    df_trimmed = df_trimmed.head(39298)
-    df_trimmed.set_index("Time", inplace=True)
+def lag_features(values, timesteps=TIMESTEPS):
+    # Window row r is values[r], values[r + 1], ..., values[r + timesteps - 1]
+    # laid end to end, which in a C-contiguous (rows, features) array is just
+    # timesteps * features consecutive elements starting at row r. The windows
+    # are therefore a read-only view with the row stride, whatever timesteps is.
+    values = np.ascontiguousarray(values)
+    n_rows, n_features = values.shape
+    return as_strided(
+        values,
+        shape=(max(n_rows - timesteps, 0), n_features * timesteps),
+        strides=values.strides,
+        writeable=False,
+    )
 
-    df = df_trimmed.copy()
-    features = df.columns.tolist()
-    timesteps = 5
 
-    df_list = [
-        df[features].shift(shift_val)
-        if (shift_val == 0)
-        else df[features].shift(-shift_val).add_suffix(f"_{shift_val}")
-        for shift_val in range(0, timesteps)
-    ]
-    df_concat = pd.concat(df_list, axis=1, sort=False)
-    df_concat = df_concat.iloc[:-timesteps, :]
-
-    target = "RUL"
-    x_train, x_test, y_train, y_test = train_test_split(
-        df_concat,
-        df[target].iloc[:-timesteps],
-        test_size=0.02642894598,
-        random_state=10,
-        shuffle=False,
+def build_frames(
+    index,
+    features,
+    values,
+    timesteps=TIMESTEPS,
+    target="RUL",
+    compact=False,
+    target_values=None,
+):
+    # Every frame is a view over the same (rows, features) array, target
+    # included as the last feature. Only the integer target column is copied,
+    # unless passed in as target_values, plus the array itself once if compact
+    # mode narrows its dtype; call .copy() on a frame if it needs to own its
+    # data.
+    dtypes = COMPACT_DTYPES if compact else DEFAULT_DTYPES
+    values = values.astype(dtypes["values"], copy=False)
+    if target_values is None:
+        target_values = values[:, -1]
+    # A float target holding NaN, for rows not labelled yet, stays float.
+    if target_values.dtype.kind != "f" or not np.isnan(target_values).any():
+        target_values = target_values.astype(dtypes["target"], copy=False)
+    df = pd.DataFrame(values[:, :-1], index=index, columns=features[:-1], copy=False)
+    df[target] = target_values
+
+    df_concat = pd.DataFrame(
+        lag_features(values, timesteps),
+        index=index[: max(len(index) - timesteps, 0)],
+        columns=lag_columns(features, timesteps),
+        copy=False,
     )
 
+    # Same split as train_test_split(..., shuffle=False), without the copies.
+    n_train = len(df_concat) - math.ceil(TEST_SIZE * len(df_concat))
+    x_train = df_concat.iloc[:n_train]
+    x_test = df_concat.iloc[n_train:]
+    y_test = df[target].iloc[n_train: len(df_concat)]
+
     df_test = x_test.iloc[:, : df.shape[1]]
 
     return df, df_test, x_test, y_test, x_train
 
+
+def preprocess_scada(
+    scada_path=SCADA_PATH,
+    status_path=STATUS_PATH,
+    fault_codes=FAULT_CODES,
+    row_limit=ROW_LIMIT,
+):
+    df = pd.read_csv(scada_path)
+    status_data_wec = pd.read_csv(status_path)
+
+    df = add_inverter_features(df)
+    df["Time"] = parse_time(df["Time"])
+    df.sort_values(by="Time", axis=0, inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    af_corr_time_wes = fault_times(status_data_wec, fault_codes)
+
+    df.rename(columns={"Error": "Fault"}, inplace=True)
+    df["Fault"] = label_faults(df["Time"].values, af_corr_time_wes)
+
+    rul_days = compute_rul(df["Time"].values, df["Fault"].values)
+    df_trimmed = df.head(len(rul_days))
+    df_trimmed["RUL"] = rul_days
+
+    for i in COLS_TO_DROP:
+        if i in list(df):
+            df_trimmed.drop(i, axis=1, inplace=True)
+
+    df_trimmed = df_trimmed.head(row_limit)
+    df_trimmed.set_index("Time", inplace=True)
+
+    values = np.ascontiguousarray(df_trimmed.values, dtype="float64")
+    return df_trimmed.index, df_trimmed.columns.tolist(), values
+
+
+def data_preprocessing(
+    scada_path=SCADA_PATH,
+    status_path=STATUS_PATH,
+    timesteps=TIMESTEPS,
+    fault_codes=FAULT_CODES,
+    row_limit=ROW_LIMIT,
+    compact=False,
+):
+    index, features, values = preprocess_scada(
+        scada_path, status_path, fault_codes, row_limit
+    )
+    return build_frames(index, features, values, timesteps, compact=compact)
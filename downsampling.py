@@ -0,0 +1,68 @@
+import numpy as np
+
+TARGET_POINTS = 2000
+
+
+def _bucket_edges(n, n_buckets):
+    return np.linspace(0, n, n_buckets + 1).astype("int64")
+
+
+def minmax_indices(y, n_out=TARGET_POINTS):
+    # Positions of the minimum and maximum of each of n_out / 2 equal buckets,
+    # in order, so spikes survive however long the series is. NaNs are
+    # skipped; an all-NaN bucket contributes nothing.
+    y = np.asarray(y, dtype="float64")
+    n = len(y)
+    if n <= n_out:
+        return np.flatnonzero(~np.isnan(y))
+    starts = _bucket_edges(n, max(n_out // 2, 1))[:-1]
+    sizes = np.diff(np.append(starts, n))
+    positions = np.arange(n)
+    picked = []
+    for reduce in (np.fmin, np.fmax):
+        bucket_extreme = np.repeat(reduce.reduceat(y, starts), sizes)
+        # First position in each bucket holding its extreme.
+        hit = np.where(y == bucket_extreme, positions, n)
+        picked.append(np.minimum.reduceat(hit, starts))
+    picked = np.concatenate(picked)
+    return np.unique(picked[picked < n])
+
+
+def lttb_indices(x, y, n_out=TARGET_POINTS):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    # per bucket, the point spanning the largest triangle with the previously
+    # kept point and the mean of the next bucket.
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    valid = np.flatnonzero(~np.isnan(y))
+    x, y = x[valid], y[valid]
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return valid
+
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    # Mean point of every bucket, for the bucket before it.
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:-1], edges[:-1] - 1) / sizes
+    mean_y = np.add.reduceat(y[1:-1], edges[:-1] - 1) / sizes
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    picked = np.empty(n_out, dtype="int64")
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - mean_x[i]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (mean_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return valid[picked]
+
+
+def downsample(x, y, n_out=TARGET_POINTS, method="minmax"):
+    if method == "lttb":
+        return lttb_indices(x, y, n_out)
+    return minmax_indices(y, n_out)
@@ -0,0 +1,178 @@
+import argparse
+import json
+import pickle
+import time
+
+import numpy as np
+
+MODEL_PATH = "assets/xgb_reg.pkl"
+NATIVE_MODEL_PATH = "assets/xgb_reg.json"
+BENCHMARK_SIZES = (1, 10, 100, 1000, 10000, 100000)
+
+
+def load_pickled(path=MODEL_PATH):
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+    # The shipped pickle is the fitted RandomizedSearchCV, not the regressor.
+    return getattr(model, "best_estimator_", model)
+
+
+def export_booster(pkl_path=MODEL_PATH, out_path=NATIVE_MODEL_PATH):
+    # XGBoost's own JSON format loads into any later XGBoost version and into
+    # TreeEnsemble below, unlike a pickle of the sklearn wrapper.
+    load_pickled(pkl_path).get_booster().save_model(out_path)
+
+
+def _as_float32(x):
+    return np.ascontiguousarray(np.asarray(x), dtype=np.float32)
+
+
+class NativeModel:
+    # Booster scored in place on a contiguous float32 array, skipping the
+    # DataFrame validation and DMatrix construction of the sklearn wrapper.
+
+    def __init__(self, path=NATIVE_MODEL_PATH):
+        import xgboost as xgb
+
+        self.booster = xgb.Booster(model_file=path)
+
+    def predict(self, x):
+        return self.booster.inplace_predict(_as_float32(x))
+
+
+class TreeEnsemble:
+    # Pure-NumPy evaluator for a gbtree regression model saved as JSON. All
+    # trees are flattened into shared node arrays and every row walks every
+    # tree at once, one tree level per step, so no xgboost import is needed.
+
+    def __init__(self, path=NATIVE_MODEL_PATH, chunksize=16384):
+        with open(path) as f:
+            learner = json.load(f)["learner"]
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise ValueError(f"unsupported booster: {booster['name']}")
+        objective = learner["objective"]["name"]
+        if objective not in ("reg:squarederror", "reg:linear"):
+            raise ValueError(f"unsupported objective: {objective}")
+
+        # Recent versions write base_score as "[5E-1]".
+        self.base_score = float(
+            str(learner["learner_model_param"]["base_score"]).strip("[]")
+        )
+        self.chunksize = chunksize
+
+        trees = booster["model"]["trees"]
+        sizes = [len(tree["left_children"]) for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype("int64")
+
+        def stack(key, dtype):
+            return np.concatenate([np.asarray(t[key], dtype=dtype) for t in trees])
+
+        left = stack("left_children", "int64")
+        right = stack("right_children", "int64")
+        tree_of_node = np.repeat(np.arange(len(trees)), sizes)
+        self.is_leaf = left == -1
+        self.left = np.where(self.is_leaf, 0, left + offsets[tree_of_node])
+        self.right = np.where(self.is_leaf, 0, right + offsets[tree_of_node])
+        self.feature = stack("split_indices", "int64")
+        # Leaves keep their value in split_conditions.
+        self.threshold = stack("split_conditions", "float32")
+        self.value = np.where(self.is_leaf, self.threshold.astype("float64"), 0.0)
+        self.default_left = stack("default_left", "int64").astype(bool)
+        self.roots = offsets
+        self.n_features = int(learner["learner_model_param"]["num_feature"])
+        self.max_depth = self._max_depth()
+
+    def _max_depth(self):
+        depth = 0
+        level = self.roots
+        while True:
+            level = level[~self.is_leaf[level]]
+            if len(level) == 0:
+                return depth
+            level = np.concatenate([self.left[level], self.right[level]])
+            depth += 1
+
+    def _predict_chunk(self, x):
+        rows = np.arange(len(x))[:, np.newaxis]
+        node = np.repeat(self.roots[np.newaxis, :], len(x), axis=0)
+        for _ in range(self.max_depth):
+            value = x[rows, self.feature[node]]
+            go_left = np.where(
+                np.isnan(value), self.default_left[node], value < self.threshold[node]
+            )
+            child = np.where(go_left, self.left[node], self.right[node])
+            node = np.where(self.is_leaf[node], node, child)
+        return (self.base_score + self.value[node].sum(axis=1)).astype("float32")
+
+    def predict(self, x):
+        x = _as_float32(x)
+        if x.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got {x.shape[1]}")
+        return np.concatenate(
+            [
+                self._predict_chunk(x[start: start + self.chunksize])
+                for start in range(0, len(x), self.chunksize)
+            ]
+            + [np.empty(0, dtype="float32")]
+        )
+
+
+def load_native(path=NATIVE_MODEL_PATH, backend="xgboost"):
+    if backend == "numpy":
+        return TreeEnsemble(path)
+    return NativeModel(path)
+
+
+def _latency(model, x, size, repeats):
+    rows = np.arange(size) % len(x)
+    batch = x.iloc[rows] if hasattr(x, "iloc") else x[rows]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(batch)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def benchmark(native_path, pkl_path=None, sizes=BENCHMARK_SIZES, repeats=20):
+    import pandas as pd
+
+    from data_cache import cached_data_preprocessing
+
+    _, _, x_test, _, x_train = cached_data_preprocessing()
+    x = pd.concat([x_train.iloc[-10000:], x_test])
+
+    models = {"xgboost": NativeModel(native_path), "numpy": TreeEnsemble(native_path)}
+    if pkl_path:
+        models["pickle"] = load_pickled(pkl_path)
+        reference = models["pickle"].predict(x_test)
+    else:
+        reference = models["xgboost"].predict(x_test)
+
+    for name, model in models.items():
+        diff = np.abs(np.asarray(model.predict(x_test)) - reference).max()
+        print(f"{name}: max abs difference on x_test {diff:.3g}")
+        for size in sizes:
+            n = max(3, min(repeats, int(2e6 // size)))
+            p50, p99 = _latency(model, x if name == "pickle" else x.values, size, n)
+            print(
+                f"  batch {size:>6}: p50 {p50 * 1e3:9.3f} ms  p99 {p99 * 1e3:9.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Native RUL model tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="pickle -> native booster JSON")
+    export.add_argument("--pickle", default=MODEL_PATH)
+    export.add_argument("--out", default=NATIVE_MODEL_PATH)
+    bench = commands.add_parser("benchmark", help="p50/p99 latency per batch size")
+    bench.add_argument("--model", default=NATIVE_MODEL_PATH)
+    bench.add_argument("--pickle", help="also time and compare the pickled model")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_booster(args.pickle, args.out)
+    else:
+        benchmark(args.model, args.pickle)
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+FIGURE_CACHE_SIZE = 128
+FIGURE_CACHE_TTL = 600.0
+
+
+def figure_key(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+class FigureCache:
+    # LRU of serialized figure JSON with a time to live. With a directory,
+    # entries are also written there so every gunicorn worker pointed at it
+    # reuses figures built by the others.
+
+    def __init__(
+        self, maxsize=FIGURE_CACHE_SIZE, ttl=FIGURE_CACHE_TTL, directory=None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.write_errors = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:  # unusable directory: this worker's LRU only
+                self.directory = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_shared(self, key):
+        try:
+            path = self._path(key)
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_shared(self, key, text):
+        # A failed write (disk full, read-only or removed directory) leaves the
+        # figure in the in-process LRU only; other workers build their own.
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except OSError:
+            with self._lock:
+                self.write_errors += 1
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._writes += 1
+        if self._writes % self.maxsize == 0:
+            self._prune_shared()
+
+    def _prune_shared(self):
+        # Expired files are only ever skipped on read; drop them now and then.
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _store(self, key, text, created):
+        self._entries[key] = (created, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.evictions += 1
+        text = self._read_shared(key) if self.directory else None
+        with self._lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.shared_hits += 1
+                self._store(key, text, now)
+        return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._store(key, text, time.monotonic())
+        if self.directory:
+            self._write_shared(key, text)
+
+    def get_or_build(self, key, build):
+        # build() returns the figure JSON; concurrent misses may both build.
+        text = self.get(key)
+        if text is None:
+            text = build()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "write_errors": self.write_errors,
+                "hit_rate": (self.hits + self.shared_hits) / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def figure_cache_from_env():
+    return FigureCache(
+        int(os.environ.get("FIGURE_CACHE_SIZE", FIGURE_CACHE_SIZE)),
+        float(os.environ.get("FIGURE_CACHE_TTL", FIGURE_CACHE_TTL)),
+        os.environ.get("FIGURE_CACHE_DIR"),
+    )
@@ -0,0 +1,265 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import data_preprocessing as dp
+from data_cache import load_processed
+
+
+class IncrementalPreprocessor:
+    # Processed SCADA history that grows by appending new rows and status
+    # events. Rows after the last fault have no RUL yet; they are kept as an
+    # open segment and labelled once a later fault closes it. An append only
+    # touches the rows from the open segment (or the earliest row a late event
+    # or late row lands in) onwards, so its cost follows the new data rather
+    # than the history.
+    #
+    # Published frames view the first _published rows of the buffers, so
+    # those rows are never written in place: an append that changes one, such
+    # as a fault labelling the open segment, copies the buffers first. Rows
+    # past them are written in place, into buffers grown by doubling. With
+    # scratch_dir set the buffers are files mapped from there, unlinked so
+    # they go away with the last frame viewing them, and growing one extends
+    # its file rather than copying the history.
+
+    def __init__(
+        self, features, fault_codes=dp.FAULT_CODES, compact=False, scratch_dir=None
+    ):
+        self.features = list(features)
+        self.fault_codes = fault_codes
+        self.compact = compact
+        self.scratch_dir = scratch_dir
+        self.dtypes = dp.COMPACT_DTYPES if compact else dp.DEFAULT_DTYPES
+        self.n_rows = 0
+        self.n_labelled = 0
+        self.version = 0
+        # First row whose label or lag inputs the last append may have changed,
+        # and the first whose time or readings it changed.
+        self.changed_from = 0
+        self.rows_changed_from = 0
+        self._published = 0
+        self._files = []
+        self._times = np.empty(0, dtype="datetime64[ns]")
+        self._values = np.empty((0, len(self.features)), dtype=self.dtypes["values"])
+        self._rul = np.empty(0, dtype=self.dtypes["target"])
+        self._fault_times = np.empty(0, dtype="datetime64[ns]")
+        self._fault_rows = np.empty(0, dtype="int64")
+
+    @classmethod
+    def from_csv(
+        cls,
+        scada_path=dp.SCADA_PATH,
+        status_path=dp.STATUS_PATH,
+        fault_codes=dp.FAULT_CODES,
+        compact=False,
+    ):
+        scada = pd.read_csv(scada_path)
+        state = cls(dp.scada_features(scada.columns), fault_codes, compact)
+        state.append(scada, pd.read_csv(status_path))
+        return state
+
+    @classmethod
+    def from_cache_entry(
+        cls,
+        directory,
+        status_path=dp.STATUS_PATH,
+        fault_codes=dp.FAULT_CODES,
+        compact=False,
+    ):
+        # Seeds the state with the rows of a data_cache entry, so appends extend
+        # exactly the rows the app serves, ROW_LIMIT included; only the status
+        # file is read again, for the fault times. The entry's memory-mapped
+        # arrays are the first buffers, published as they are, and the
+        # buffers appends grow are scratch files in the entry's directory. The
+        # entry was labelled from the whole history, so its last row closes a
+        # segment even where ROW_LIMIT cut it short of a fault.
+        index, features, values, target = load_processed(directory, mmap_mode="r")
+        state = cls(features, fault_codes, compact, scratch_dir=directory)
+        n = len(index)
+        state._times = np.asarray(index.values)
+        state._values = values
+        state._rul = target
+        state.n_rows = state.n_labelled = state._published = n
+        faults = dp.fault_times(pd.read_csv(status_path), fault_codes)
+        state._fault_times = np.unique(faults[~np.isnat(faults)])
+        fault = dp.label_faults(state._times, state._fault_times)
+        fault_rows = np.flatnonzero(fault)
+        if n and (len(fault_rows) == 0 or fault_rows[-1] != n - 1):
+            fault_rows = np.append(fault_rows, n - 1)
+        state._fault_rows = fault_rows
+        return state
+
+    def _buffer(self, file, like, capacity):
+        shape = (capacity,) + like.shape[1:]
+        if file is None:
+            return np.empty(shape, dtype=like.dtype)
+        return np.memmap(file, dtype=like.dtype, mode="r+", shape=shape)
+
+    def _reserve(self, n_rows, first_write):
+        # Makes rows first_write..n_rows of the buffers writable.
+        buffers = [self._times, self._values, self._rul]
+        capacity = len(self._times)
+        if first_write >= self._published:
+            if n_rows <= capacity:
+                return
+            if self._files:
+                capacity = max(n_rows, 2 * capacity)
+                self._times, self._values, self._rul = [
+                    self._buffer(file, buffer, capacity)
+                    for file, buffer in zip(self._files, buffers)
+                ]
+                return
+        if n_rows > capacity:
+            capacity = max(n_rows, 2 * capacity, 1024)
+        if self.scratch_dir is None:
+            self._files = [None] * len(buffers)
+        else:
+            self._files = [
+                tempfile.TemporaryFile(dir=self.scratch_dir) for _ in buffers
+            ]
+        new = [
+            self._buffer(file, buffer, capacity)
+            for file, buffer in zip(self._files, buffers)
+        ]
+        for old, buffer in zip(buffers, new):
+            buffer[: self.n_rows] = old[: self.n_rows]
+        self._times, self._values, self._rul = new
+        if self.scratch_dir is None:
+            self._files = []
+        self._published = 0
+
+    def _merge_rows(self, scada_rows):
+        # The rows from where the new rows land onwards, old and new, in time
+        # order; rows older than the current tail are merged into it, in-order
+        # appends just go to the end.
+        rows = dp.add_inverter_features(scada_rows.copy())
+        times = dp.parse_time(rows["Time"]).values
+        rows = rows.loc[~np.isnat(times)]
+        times = times[~np.isnat(times)]
+        if len(times) == 0:
+            return self.n_rows, times, self._values[:0]
+
+        rows["RUL"] = np.nan
+        values = rows[self.features].values.astype(self._values.dtype)
+        order = np.argsort(times, kind="mergesort")
+        times, values = times[order], values[order]
+
+        start = np.searchsorted(self._times[: self.n_rows], times[0], side="right")
+        if start < self.n_rows:
+            times = np.concatenate([self._times[start : self.n_rows], times])
+            values = np.concatenate([self._values[start : self.n_rows], values])
+            order = np.argsort(times, kind="mergesort")
+            times, values = times[order], values[order]
+        return start, times, values
+
+    def append(self, scada_rows=None, status_events=None):
+        start, times, values = self.n_rows, self._times[:0], self._values[:0]
+        if scada_rows is not None and len(scada_rows):
+            start, times, values = self._merge_rows(scada_rows)
+        n_rows = start + len(times)
+        touched = start
+
+        if status_events is not None and len(status_events):
+            new_faults = dp.fault_times(status_events, self.fault_codes)
+            new_faults = new_faults[~np.isnat(new_faults)]
+            if len(new_faults):
+                self._fault_times = np.union1d(self._fault_times, new_faults)
+                touched = min(
+                    touched,
+                    np.searchsorted(self._times[:start], new_faults.min()),
+                )
+
+        # Relabel from the start of the segment containing the first touched
+        # row: that is everything after the last fault row before it.
+        kept = np.searchsorted(self._fault_rows, touched)
+        segment_start = self._fault_rows[kept - 1] + 1 if kept else 0
+        segment_times = np.concatenate([self._times[segment_start:start], times])
+        fault = dp.label_faults(segment_times, self._fault_times)
+        rul = dp.compute_rul(segment_times, fault)
+        n_labelled = segment_start + len(rul)
+        # Rows of the segment that were labelled before, or are now, change.
+        relabel = max(n_labelled, min(self.n_labelled, start)) > segment_start
+        unlabelled_from = n_labelled if relabel else max(n_labelled, start)
+
+        self._reserve(n_rows, segment_start if relabel else start)
+        self._times[start:n_rows] = times
+        self._values[start:n_rows] = values
+        self._rul[segment_start:n_labelled] = rul
+        self._values[segment_start:n_labelled, -1] = rul
+        self._values[unlabelled_from:n_rows, -1] = np.nan
+        self._fault_rows = np.concatenate(
+            [self._fault_rows[:kept], segment_start + np.flatnonzero(fault)]
+        )
+        self.n_rows = n_rows
+        self.n_labelled = n_labelled
+        self.changed_from = segment_start
+        self.rows_changed_from = start
+        self.version += 1
+        return self.frames()
+
+    def processed(self):
+        # Same triple as dp.preprocess_scada(..., row_limit=None).
+        n = self.n_labelled
+        self._published = max(self._published, n)
+        index = pd.DatetimeIndex(self._times[:n], name="Time")
+        return index, self.features, self._values[:n]
+
+    def frames(self, timesteps=dp.TIMESTEPS):
+        # Every row, so the readings after the last fault reach the graph and
+        # the newest lag windows; their RUL is NaN until a fault labels them.
+        n = self._published = self.n_rows
+        target = self._rul[:n] if n == self.n_labelled else self._values[:n, -1]
+        return dp.build_frames(
+            pd.DatetimeIndex(self._times[:n], name="Time"),
+            self.features,
+            self._values[:n],
+            timesteps,
+            compact=self.compact,
+            target_values=target,
+        )
+
+
+def parse_new_data(payload, features):
+    # {"scada": [...], "status": [...]}: raw SCADA rows and status events as
+    # records with the CSV columns, returned as the frames append() takes.
+    # Raises ValueError for anything append() would fail on, so nothing bad
+    # reaches the shared append log.
+    if not isinstance(payload, dict) or not {"scada", "status"} & set(payload):
+        raise ValueError('expected an object with "scada" and/or "status" records')
+    # features are the sensors, the two inverter aggregates and RUL.
+    numeric = {
+        "scada": list(features[:-3]) + dp.INVERTER_TEMP_COLUMNS,
+        "status": ["Main Status"],
+    }
+    frames = []
+    for key in ("scada", "status"):
+        records = payload.get(key) or []
+        if not isinstance(records, list) or not all(
+            isinstance(record, dict) for record in records
+        ):
+            raise ValueError(f'"{key}" must be a list of records')
+        if not records:
+            frames.append(None)
+            continue
+        frame = pd.DataFrame.from_records(records)
+        missing = [c for c in ["Time"] + numeric[key] if c not in frame.columns]
+        if missing:
+            raise ValueError(f'"{key}" records are missing columns: {missing}')
+        try:
+            frame[numeric[key]] = frame[numeric[key]].astype("float64")
+            if key == "status":
+                pd.to_datetime(frame["Time"])
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'"{key}" records: {e}')
+        if key == "scada":
+            # append() would drop these rows, and the request would still
+            # succeed; the whole body is rejected instead.
+            unparsed = np.flatnonzero(dp.parse_time(frame["Time"]).isna())
+            if len(unparsed):
+                raise ValueError(
+                    f'"scada" records at positions {unparsed[:10].tolist()} have '
+                    "no parseable Time"
+                )
+        frames.append(frame)
+    return frames
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+import data_preprocessing as dp
+from prediction_cache import estimate_rul
+
+REPLAY_WINDOW = 7 * 144  # one week of 10-minute rows
+ROW_SECONDS = 600
+
+
+class RingBuffer:
+    # Fixed-size ring of the latest rows. Every row is written twice, capacity
+    # rows apart, so the latest k rows are always one contiguous slice and no
+    # push or read ever copies the whole buffer.
+
+    def __init__(self, capacity, n_columns, dtype="float64"):
+        self.capacity = capacity
+        self.size = 0
+        self._head = 0
+        self._data = np.full((2 * capacity, n_columns), np.nan, dtype=dtype)
+
+    def push(self, rows):
+        for row in rows:
+            self._data[self._head] = row
+            self._data[self._head + self.capacity] = row
+            self._head = (self._head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+
+    def latest(self, k):
+        end = self._head + self.capacity
+        return self._data[end - min(k, self.size): end]
+
+
+class ReplayStream:
+    # Rows pushed one at a time, as they would arrive from the turbine. Each
+    # row completes one lag window (the last `timesteps` rows, flattened as in
+    # dp.lag_features), which is scored right away; the RUL is estimated over
+    # the predictions of the last `window` rows, as the dashboard does for the
+    # last week. The cost of a push depends only on the rows pushed.
+
+    def __init__(
+        self, model, columns, n_features, timesteps=dp.TIMESTEPS, window=REPLAY_WINDOW
+    ):
+        self.model = model
+        self.columns = columns
+        self.timesteps = timesteps
+        self.rows = RingBuffer(timesteps, n_features)
+        self.predictions = RingBuffer(window, 1, dtype="float32")
+        self.position = 0
+
+    def push(self, rows):
+        windows = []
+        for row in rows:
+            self.rows.push([row])
+            if self.rows.size == self.timesteps:
+                windows.append(self.rows.latest(self.timesteps).ravel().copy())
+        self.position += len(rows)
+        if not windows:
+            return np.empty(0, dtype="float32")
+        x = pd.DataFrame(np.stack(windows), columns=self.columns, copy=False)
+        y_pred = np.asarray(self.model.predict(x), dtype="float32")
+        self.predictions.push(y_pred[:, np.newaxis])
+        # Rows before the first full window have no prediction.
+        return np.concatenate(
+            [np.full(len(rows) - len(y_pred), np.nan, dtype="float32"), y_pred]
+        )
+
+    def rul(self):
+        predictions = self.predictions.latest(self.predictions.capacity)
+        if not len(predictions):
+            return 0.0
+        return estimate_rul(predictions)
+
+
+def rows_due(started, now, speedup, position, start_position, limit):
+    # Source rows that should have been replayed by `now` at `speedup` times
+    # the 10-minute cadence; dropped ticks are caught up on the next one.
+    due = start_position + int((now - started) * speedup / ROW_SECONDS)
+    return max(min(due, limit) - position, 0)
@@ -0,0 +1,328 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from benchmark import CALLBACK_PATH, update_graph_body
+
+DURATION = 60.0
+WARMUP = 5.0
+USERS = 10
+THINK_TIME = 1.0
+PORT = 8051
+STARTUP_TIMEOUT = 900.0
+REQUEST_TIMEOUT = 120.0
+POLL_INTERVAL = 0.5  # the dashboard's job-poll-interval
+MAX_POLLS = 240
+# Relative weights of what an operator does next.
+MIX = {"feature_switch": 4, "date_range": 3, "zoom": 2, "predict": 1}
+
+
+def http(url, body=None):
+    # (seconds, status, response bytes, response body); status 0 when no
+    # response came back at all.
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            payload, status = response.read(), response.status
+    except urllib.error.HTTPError as e:
+        payload, status = e.read(), e.code
+    except OSError:
+        payload, status = b"", 0
+    return time.perf_counter() - start, status, len(payload), payload
+
+
+def find_props(layout, component_id):
+    # Props of the component with this id in a /_dash-layout tree.
+    if isinstance(layout, list):
+        for child in layout:
+            props = find_props(child, component_id)
+            if props is not None:
+                return props
+    elif isinstance(layout, dict):
+        props = layout.get("props", {})
+        if props.get("id") == component_id:
+            return props
+        return find_props(props.get("children"), component_id)
+    return None
+
+
+def polling_done(payload):
+    return json.loads(payload)["response"]["job-poll-interval"]["disabled"]
+
+
+class Dashboard:
+    # What an operator can pick from, read once from the served layout.
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        _, status, _, payload = http(self.url + "/_dash-layout")
+        if status != 200:
+            raise RuntimeError(f"{self.url}/_dash-layout returned {status}")
+        layout = json.loads(payload)
+        dropdown = find_props(layout, "feature-dropdown")
+        self.columns = [option["value"] for option in dropdown["options"]]
+        picker = find_props(layout, "date-picker")
+        self.first = pd.Timestamp(picker["min_date_allowed"])
+        self.last = pd.Timestamp(picker["max_date_allowed"])
+
+
+class Operator(threading.Thread):
+    # One simulated dashboard user: a page load, then actions drawn from MIX
+    # with exponential think times until the deadline. Every request is
+    # appended to results as (action, started, seconds, status, bytes).
+
+    def __init__(self, dashboard, deadline, think_time, seed, results, lock):
+        super().__init__(daemon=True)
+        self.dashboard = dashboard
+        self.deadline = deadline
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.results = results
+        self.lock = lock
+        self.column = "WEC: ava. windspeed"
+        self.n_get_new_info = None
+        self.n_pred = None
+
+    def record(self, action, started, seconds, status, n_bytes):
+        with self.lock:
+            self.results.append((action, started, seconds, status, n_bytes))
+
+    def request(self, action, path, body=None):
+        started = time.time()
+        seconds, status, n_bytes, payload = http(self.dashboard.url + path, body)
+        self.record(action, started, seconds, status, n_bytes)
+        return status, payload
+
+    def update_graph(self, action, **kwargs):
+        kwargs.setdefault("n_get_new_info", self.n_get_new_info)
+        kwargs.setdefault("n_pred", self.n_pred)
+        return self.request(
+            action, CALLBACK_PATH, update_graph_body(self.column, **kwargs)
+        )
+
+    def page_load(self):
+        self.request("page_load", "/")
+        self.update_graph("initial_graph", changed=None)
+
+    def feature_switch(self):
+        self.column = self.rng.choice(self.dashboard.columns)
+        self.update_graph("feature_switch")
+
+    def date_range(self):
+        first, last = self.dashboard.first, self.dashboard.last
+        span = pd.Timedelta(days=self.rng.uniform(1, 30))
+        start = first + (last - first - span) * self.rng.random()
+        self.update_graph(
+            "date_range",
+            start_date=str(start.date()),
+            end_date=str((start + span).date()),
+            changed="date-picker.end_date",
+        )
+
+    def zoom(self):
+        first, last = self.dashboard.first, self.dashboard.last
+        start = first + (last - first) * self.rng.random()
+        relayout_data = {
+            "xaxis.range[0]": str(start),
+            "xaxis.range[1]": str(start + pd.Timedelta(hours=self.rng.uniform(6, 96))),
+        }
+        self.update_graph(
+            "zoom", relayout_data=relayout_data, changed="Main-Graph.relayoutData"
+        )
+
+    def predict(self):
+        # 'Get New Data', then 'Predict', then the job polls until the RUL is
+        # in; predict_result is the time the operator waited for it.
+        self.n_get_new_info = (self.n_get_new_info or 0) + 1
+        self.update_graph("get_new_data", changed="get-new-info-button.n_clicks")
+        self.n_pred = (self.n_pred or 0) + 1
+        started = time.time()
+        status, payload = self.update_graph(
+            "predict_click", changed="predict-button.n_clicks"
+        )
+        for n_intervals in range(1, MAX_POLLS + 1):
+            if status != 200 or polling_done(payload):
+                break
+            time.sleep(POLL_INTERVAL)
+            status, payload = self.update_graph(
+                "predict_poll",
+                n_intervals=n_intervals,
+                changed="job-poll-interval.n_intervals",
+            )
+        self.record("predict_result", started, time.time() - started, status, 0)
+
+    def run(self):
+        time.sleep(self.rng.uniform(0, self.think_time))
+        self.page_load()
+        actions, weights = zip(*MIX.items())
+        while time.time() < self.deadline:
+            getattr(self, self.rng.choices(actions, weights)[0])()
+            if self.think_time:
+                time.sleep(self.rng.expovariate(1 / self.think_time))
+
+
+def run_load(url, users=USERS, duration=DURATION, think_time=THINK_TIME, seed=0):
+    dashboard = Dashboard(url)
+    results, lock = [], threading.Lock()
+    deadline = time.time() + duration
+    operators = [
+        Operator(dashboard, deadline, think_time, seed + i, results, lock)
+        for i in range(users)
+    ]
+    for operator in operators:
+        operator.start()
+    for operator in operators:
+        operator.join()
+    return results
+
+
+def summarize(results, warmup=WARMUP):
+    # Per action and overall, over requests started after the warm-up.
+    frame = pd.DataFrame(
+        results, columns=["action", "started", "seconds", "status", "bytes"]
+    )
+    frame = frame[frame["started"] >= frame["started"].min() + warmup]
+    if frame.empty:
+        return pd.DataFrame()
+    elapsed = frame["started"].max() - frame["started"].min()
+    requests = frame[frame["action"] != "predict_result"]
+    rows = {}
+    groups = [("all requests", requests)] + list(frame.groupby("action"))
+    for action, group in groups:
+        seconds = group["seconds"].to_numpy()
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1e3
+        rows[action] = {
+            "count": len(group),
+            "errors": int((~group["status"].isin([200, 204])).sum()),
+            "per_s": len(group) / elapsed if elapsed else float("nan"),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "mean_kb": group["bytes"].mean() / 1e3,
+            "max_kb": group["bytes"].max() / 1e3,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def start_gunicorn(workers, threads, port=PORT, workdir=".", extra_args=""):
+    # gunicorn switches to its threaded worker when threads > 1. The app is
+    # imported from this checkout and reads data/ under workdir.
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])),
+    )
+    command = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "app:server",
+        "--workers",
+        str(workers),
+        "--threads",
+        str(threads),
+        "--bind",
+        f"127.0.0.1:{port}",
+        "--timeout",
+        str(int(REQUEST_TIMEOUT)),
+    ] + shlex.split(extra_args)
+    return subprocess.Popen(command, cwd=workdir, env=env)
+
+
+def wait_until_ready(process, url, timeout=STARTUP_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        if http(url + "/_dash-layout")[1] == 200:
+            return
+        time.sleep(1)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def parse_counts(text):
+    return [int(count) for count in str(text).split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Concurrent operators against the dashboard's callback endpoint"
+    )
+    parser.add_argument("--url", help="load an already running instance instead")
+    parser.add_argument("--workers", default="1", help="gunicorn workers, e.g. 1,2,4")
+    parser.add_argument("--threads", default="1", help="threads per worker, e.g. 1,8")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workdir", default=".", help="directory holding data/")
+    parser.add_argument("--gunicorn-args", default="", help="extra gunicorn options")
+    parser.add_argument("--users", type=int, default=USERS)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--warmup", type=float, default=WARMUP)
+    parser.add_argument("--think-time", type=float, default=THINK_TIME)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write every summary to this file")
+    args = parser.parse_args()
+
+    pd.set_option("display.width", 160)
+    if args.url:
+        configs = [(None, None)]
+    else:
+        configs = list(
+            itertools.product(parse_counts(args.workers), parse_counts(args.threads))
+        )
+    summaries = {}
+    for workers, threads in configs:
+        url = args.url or f"http://127.0.0.1:{args.port}"
+        process = None
+        if workers is not None:
+            process = start_gunicorn(
+                workers, threads, args.port, args.workdir, args.gunicorn_args
+            )
+        try:
+            if process is not None:
+                wait_until_ready(process, url)
+            results = run_load(
+                url, args.users, args.duration, args.think_time, args.seed
+            )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        name = url if workers is None else f"{workers} workers x {threads} threads"
+        summary = summarize(results, args.warmup)
+        summaries[name] = summary
+        print(f"\n{name}, {args.users} users, think time {args.think_time}s")
+        print(summary.round(1).to_string())
+
+    if len(summaries) > 1:
+        overall = pd.DataFrame(
+            {
+                name: summary.loc["all requests"]
+                for name, summary in summaries.items()
+                if not summary.empty
+            }
+        ).T
+        print("\nall requests")
+        print(overall[["per_s", "p50_ms", "p95_ms", "p99_ms", "errors"]].round(1))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {name: summary.to_dict("index") for name, summary in summaries.items()},
+                f,
+                indent=2,
+            )
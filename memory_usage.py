@@ -0,0 +1,78 @@
+import mmap
+
+import numpy as np
+import pandas as pd
+
+FRAME_NAMES = ("df", "df_button", "x_test", "y_test", "x_train")
+
+
+def _root(array):
+    while True:
+        if isinstance(array.base, np.ndarray):
+            array = array.base
+        elif isinstance(getattr(array.base, "base", None), np.ndarray):
+            # as_strided() views hang off a small wrapper object
+            array = array.base.base
+        else:
+            return array
+
+
+def _arrays(frame):
+    arrays = [np.asarray(frame.index.values)]
+    if isinstance(frame, pd.Series):
+        arrays.append(frame.values)
+    else:
+        arrays.extend(column.values for _, column in frame.items())
+    return arrays
+
+
+def frame_memory(frames, names=FRAME_NAMES):
+    # Frames built by build_frames() share buffers, so summing memory_usage()
+    # over them counts the same bytes several times. Each distinct buffer is
+    # charged to the first frame that references it instead; memory-mapped
+    # buffers are reported separately since they live in the page cache.
+    seen = set()
+    rows = []
+    for name, frame in zip(names, frames):
+        owned = mapped = 0
+        for array in _arrays(frame):
+            root = _root(array)
+            if id(root) in seen:
+                continue
+            seen.add(id(root))
+            if isinstance(root, np.memmap) or isinstance(root.base, mmap.mmap):
+                mapped += root.nbytes
+            else:
+                owned += root.nbytes
+        rows.append(
+            {
+                "frame": name,
+                "shape": frame.shape,
+                "dtypes": sorted({str(d) for d in np.atleast_1d(frame.dtypes)}),
+                "nominal": int(np.sum(frame.memory_usage(index=True, deep=True))),
+                "owned": owned,
+                "mapped": mapped,
+            }
+        )
+    return rows
+
+
+def memory_report(frames, names=FRAME_NAMES):
+    rows = frame_memory(frames, names)
+    lines = [
+        f"{'frame':<10} {'shape':>16} {'dtypes':<24} {'nominal MB':>11} "
+        f"{'owned MB':>9} {'mapped MB':>10}"
+    ]
+    for row in rows:
+        lines.append(
+            f"{row['frame']:<10} {str(row['shape']):>16} "
+            f"{','.join(row['dtypes']):<24} {row['nominal'] / 2**20:>11.1f} "
+            f"{row['owned'] / 2**20:>9.1f} {row['mapped'] / 2**20:>10.1f}"
+        )
+    lines.append(
+        f"{'total':<10} {'':>16} {'':<24} "
+        f"{sum(r['nominal'] for r in rows) / 2**20:>11.1f} "
+        f"{sum(r['owned'] for r in rows) / 2**20:>9.1f} "
+        f"{sum(r['mapped'] for r in rows) / 2**20:>10.1f}"
+    )
+    return "\n".join(lines)
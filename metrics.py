@@ -0,0 +1,222 @@
+import cProfile
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (1e2, 1e3, 1e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+ROW_BUCKETS = (1, 10, 100, 1e3, 1e4, 1e5, 1e6, 1e7)
+CALLBACK_PATH = "/_dash-update-component"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRICS = {
+    "dashboard_request_seconds": (
+        "histogram",
+        "Request latency by route, and by first output for Dash callbacks.",
+    ),
+    "dashboard_response_bytes": (
+        "histogram",
+        "Response body size by route, and by first output for Dash callbacks.",
+    ),
+    "dashboard_stage_seconds": ("histogram", "Time spent in each callback stage."),
+    "dashboard_inference_seconds": ("histogram", "Model predict call latency."),
+    "dashboard_inference_rows": ("histogram", "Rows scored per model predict call."),
+    "dashboard_requests_total": ("counter", "Requests by route and status code."),
+}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            yield f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}"
+        yield f"{name}_sum{_labels(labels)} {self.sum!r}"
+        yield f"{name}_count{_labels(labels)} {cumulative}"
+
+
+class Metrics:
+    # Histograms and counters for this process in the Prometheus text format.
+    # Under gunicorn every worker keeps its own, so a scrape of /metrics sees
+    # the worker that answered it; the pid label tells them apart.
+
+    def __init__(self, described=METRICS):
+        self.described = dict(described)
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def stage(self, stage):
+        return self.timer("dashboard_stage_seconds", stage=stage)
+
+    def collect_stats(self, prefix, help, stats):
+        # Exports the numeric entries of stats(), e.g. a cache's hit counts,
+        # as gauges named prefix_<key> at every scrape.
+        self._collectors.append((prefix, help, stats))
+
+    def render(self):
+        pid = (("pid", os.getpid()),)
+        families = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                families.setdefault(name, []).extend(
+                    histogram.lines(name, pid + labels)
+                )
+            for (name, labels), value in self._counters.items():
+                families.setdefault(name, []).append(
+                    f"{name}{_labels(pid + labels)} {_number(value)}"
+                )
+        out = []
+        for name in sorted(families):
+            kind, help = self.described.get(name, ("untyped", ""))
+            out += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            out += families[name]
+        for prefix, help, stats in self._collectors:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{prefix}_{key}"
+                    out += [
+                        f"# HELP {name} {help} ({key}).",
+                        f"# TYPE {name} gauge",
+                        f"{name}{_labels(pid)} {_number(value)}",
+                    ]
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+
+def callback_name(body):
+    # Dash sends a multi-output callback's outputs as "..a.prop...b.prop..";
+    # the first output names the callback well enough for a label.
+    output = (body or {}).get("output") or "unknown"
+    return output.strip(".").split("...")[0]
+
+
+def request_route():
+    if request.path == CALLBACK_PATH:
+        return callback_name(request.get_json(silent=True))
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+class RequestProfiler:
+    # Opt-in cProfile of single callback requests, dumped to directory as
+    # <time>-<callback>.prof for pstats or snakeviz. One request is profiled
+    # at a time; requests arriving meanwhile run unprofiled.
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is active in this process
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, route):
+        profile.disable()
+        self._busy.release()
+        name = re.sub(r"[^\w.-]+", "_", route).strip("_") or "request"
+        path = os.path.join(self.directory, f"{time.time():.6f}-{name}.prof")
+        profile.dump_stats(path)
+
+
+def instrument(server, profile_dir=None):
+    # Times every request, records response sizes and serves /metrics; with
+    # profile_dir, also profiles each callback request into that directory.
+    profiler = RequestProfiler(profile_dir) if profile_dir else None
+
+    @server.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        if profiler is not None and request.path == CALLBACK_PATH:
+            g.profile = profiler.start()
+
+    @server.after_request
+    def record_request(response):
+        if "metrics_start" not in g:
+            return response
+        route = request_route()
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profiler.stop(profile, route)
+        metrics.observe(
+            "dashboard_request_seconds",
+            time.perf_counter() - g.pop("metrics_start"),
+            route=route,
+        )
+        metrics.inc(
+            "dashboard_requests_total", route=route, status=response.status_code
+        )
+        if response.content_length is not None:
+            metrics.observe(
+                "dashboard_response_bytes",
+                response.content_length,
+                SIZE_BUCKETS,
+                route=route,
+            )
+        return response
+
+    @server.route("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
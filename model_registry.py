@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from fast_inference import load_native
+from metrics import ROW_BUCKETS, metrics
+
+MODEL_PATH = "assets/xgb_reg.pkl"
+DEFAULT_MODEL = "default"
+
+
+class LoadedModel:
+    def __init__(self, name, path, model, version, stat):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.version = version
+        self.stat = stat
+
+    def predict(self, x):
+        with metrics.timer("dashboard_inference_seconds", model=self.name):
+            y_pred = self.model.predict(x)
+        metrics.observe(
+            "dashboard_inference_rows", len(x), ROW_BUCKETS, model=self.name
+        )
+        return y_pred
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_model(name, path):
+    # Pickles hold the sklearn wrapper; anything else is a native booster file
+    # (see fast_inference.export_booster), scored by xgboost or, with
+    # MODEL_BACKEND=numpy, by the pure-NumPy evaluator.
+    with open(path, "rb") as f:
+        data = f.read()
+    version = f"{name}:{hashlib.blake2b(data, digest_size=8).hexdigest()}"
+    if path.endswith(".pkl"):
+        return pickle.loads(data), version
+    return load_native(path, os.environ.get("MODEL_BACKEND", "xgboost")), version
+
+
+class ModelRegistry:
+    # Named model files loaded once per process and kept warm. get() returns
+    # the current LoadedModel; when a file changes on disk it is reloaded and
+    # swapped in with a single assignment, so callers that already hold the
+    # previous model finish their predictions on it undisturbed.
+
+    def __init__(self, check_interval=1.0, loader=load_model):
+        self.check_interval = check_interval
+        self.loader = loader
+        self._paths = {}
+        self._models = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+        self.default = None
+
+    def register(self, name, path, default=False):
+        self._paths[name] = path
+        if default or self.default is None:
+            self.default = name
+
+    def names(self):
+        return list(self._paths)
+
+    def _load(self, name):
+        path = self._paths[name]
+        stat = _stat_key(path)
+        with metrics.stage("model_load"):
+            model, version = self.loader(name, path)
+        # A file rewritten while it was being read shows a new stat; keep the
+        # old stat so the next check loads it again.
+        if _stat_key(path) != stat:
+            stat = None
+        self._models[name] = LoadedModel(name, path, model, version, stat)
+
+    def get(self, name=None):
+        name = self.default if name is None else name
+        loaded = self._models.get(name)
+        now = time.monotonic()
+        if loaded is not None and now - self._checked.get(name, 0) < self.check_interval:
+            return loaded
+
+        with self._lock:
+            loaded = self._models.get(name)
+            self._checked[name] = now
+            try:
+                changed = loaded is None or _stat_key(self._paths[name]) != loaded.stat
+            except OSError:
+                # Mid-replace or removed: keep serving what is loaded.
+                changed = loaded is None
+            if changed:
+                try:
+                    self._load(name)
+                except Exception:
+                    if loaded is None:
+                        raise
+            return self._models[name]
+
+
+registry = ModelRegistry()
+registry.register(DEFAULT_MODEL, os.environ.get("MODEL_PATH", MODEL_PATH))
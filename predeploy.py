@@ -0,0 +1,11 @@
+from data_cache import cached_data_preprocessing, dataset_settings_from_env
+from model_registry import registry
+from rul_timeline import load_or_build_timeline
+
+# Warms the preprocessing cache and the predicted RUL timeline at deploy time,
+# so no worker has to build either on its first start. The cache entry depends
+# on the app's dataset settings, so the same environment is read here.
+df, df_button, x_test, y_test, x_train = cached_data_preprocessing(
+    **dataset_settings_from_env()
+)
+load_or_build_timeline(registry.get(), df, (x_train, x_test))
@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+PREDICTION_CACHE_SIZE = 256
+
+
+def estimate_rul(y_pred):
+    # The dashboard reports the largest predicted RUL over the window.
+    return round(float(np.max(y_pred)))
+
+
+def window_key(x):
+    values = np.ascontiguousarray(np.asarray(x))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{values.shape}{values.dtype}".encode())
+    h.update(repr(list(getattr(x, "columns", []))).encode())
+    h.update(values.data)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    # LRU of model outputs keyed by (model version, content hash of the
+    # feature window), so the same window scored by another session or worker
+    # thread comes back without running the model. Entries for an older model
+    # version are dropped as soon as a newer version is seen.
+
+    def __init__(self, maxsize=PREDICTION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self._version:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+            self._version = version
+
+    def predict(self, model, x, key=None):
+        # key may be passed in when the caller already has window_key(x).
+        key = window_key(x) if key is None else key
+        with self._lock:
+            self._check_version(model.version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        return self.store(model.version, key, model.predict(x))
+
+    def store(self, version, key, y_pred, switch=False):
+        # With switch, predictions made elsewhere (e.g. in a job's pool
+        # process) move the cache to their model version like predict() does.
+        y_pred = np.asarray(y_pred)
+        y_pred.flags.writeable = False
+        entry = (y_pred, estimate_rul(y_pred))
+
+        with self._lock:
+            if switch:
+                self._check_version(version)
+            # The model may have been swapped while predicting.
+            if version == self._version:
+                self._entries[key] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "model_version": self._version,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+prediction_cache = PredictionCache()
+
+
+def score_window(model_name, x, key):
+    # Module-level job body, so it also runs in a process pool: the process
+    # scores with its own registry's copy of the model and returns what
+    # store_result needs to cache the predictions in the submitting process.
+    from model_registry import registry
+
+    model = registry.get(model_name)
+    y_pred, _ = prediction_cache.predict(model, x, key)
+    return model.version, key, y_pred
+
+
+def store_result(result):
+    version, key, y_pred = result
+    return prediction_cache.store(version, key, y_pred, switch=True)
@@ -0,0 +1,67 @@
+import hashlib
+import os
+
+import numpy as np
+
+from data_cache import build_lock
+
+PREDICTED_RUL = "Predicted RUL"
+TIMELINE_CHUNKSIZE = 65536
+
+
+def predict_timeline(
+    model, n_rows, lag_frames, start=0, previous=None, chunksize=TIMELINE_CHUNKSIZE
+):
+    # Predicted RUL for every row of df that starts a lag window, scored in
+    # chunks over the consecutive lag frames (x_train, then x_test). Rows
+    # before start are taken from previous; the last timesteps rows, which
+    # start no window, stay NaN.
+    timeline = np.full(n_rows, np.nan, dtype="float32")
+    if previous is not None and start:
+        timeline[:start] = previous[:start]
+
+    offset = 0
+    for frame in lag_frames:
+        for chunk_start in range(max(start - offset, 0), len(frame), chunksize):
+            chunk = frame.iloc[chunk_start: chunk_start + chunksize]
+            timeline[offset + chunk_start: offset + chunk_start + len(chunk)] = (
+                model.predict(chunk)
+            )
+        offset += len(frame)
+    return timeline
+
+
+def timeline_path(cache_dir, model_version, df):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model_version.encode())
+    h.update(np.ascontiguousarray(df.index.asi8).data)
+    h.update(np.ascontiguousarray(df["RUL"].values).data)
+    return os.path.join(cache_dir, f"rul-timeline-{h.hexdigest()}.npy")
+
+
+def load_or_build_timeline(model, df, lag_frames, cache_dir="data/.cache"):
+    # The batch job: the whole history is scored once per model version and
+    # dataset and kept on disk, so dashboard requests never run inference.
+    # Workers starting together wait for the first one's build.
+    path = timeline_path(cache_dir, model.version, df)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+    os.makedirs(cache_dir, exist_ok=True)
+    with build_lock(cache_dir):
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        timeline = predict_timeline(model, len(df), lag_frames)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, timeline)
+        os.replace(tmp, path)
+    return timeline
+
+
+if __name__ == "__main__":
+    from data_cache import cached_data_preprocessing, dataset_settings_from_env
+    from model_registry import registry
+
+    df, _, x_test, _, x_train = cached_data_preprocessing(
+        **dataset_settings_from_env()
+    )
+    print(load_or_build_timeline(registry.get(), df, (x_train, x_test)).shape)
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_preprocessing as dp
+
+CHUNKSIZE = 100000
+
+
+def _allocate(out_dir, name, shape, dtype="float64"):
+    # Outputs live in RAM by default; with out_dir they are memory-mapped .npy
+    # files, so resident memory stays bounded by the chunk size.
+    if out_dir is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(
+        os.path.join(out_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape
+    )
+
+
+def read_fault_times(status_path, fault_codes=dp.FAULT_CODES, chunksize=CHUNKSIZE):
+    chunks = pd.read_csv(
+        status_path, usecols=["Time", "Main Status"], chunksize=chunksize
+    )
+    return np.concatenate(
+        [dp.fault_times(chunk, fault_codes) for chunk in chunks]
+        + [np.empty(0, dtype="datetime64[ns]")]
+    )
+
+
+def streaming_preprocess_scada(
+    scada_path=dp.SCADA_PATH,
+    status_path=dp.STATUS_PATH,
+    fault_codes=dp.FAULT_CODES,
+    row_limit=dp.ROW_LIMIT,
+    chunksize=CHUNKSIZE,
+    out_dir=None,
+    dtype="float64",
+):
+    # Same result as dp.preprocess_scada(), but the SCADA file is never held in
+    # memory as a whole. Peak memory is roughly one chunk of parsed CSV plus
+    # 16 bytes per row for the time index and row order; the output can be
+    # memory-mapped through out_dir, and written directly in a narrower dtype.
+    fault_times = read_fault_times(status_path, fault_codes, chunksize)
+
+    # Pass 1: only the Time column, to find the sorted order, the fault rows
+    # and the RUL of every row before any feature is parsed.
+    times = np.concatenate(
+        [
+            dp.parse_time(chunk["Time"]).values
+            for chunk in pd.read_csv(scada_path, usecols=["Time"], chunksize=chunksize)
+        ]
+    )
+    order = np.argsort(times, kind="mergesort")
+    times = times[order]
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    del order
+
+    rul = dp.compute_rul(times, dp.label_faults(times, fault_times))
+    n_rows = len(rul) if row_limit is None else min(len(rul), row_limit)
+
+    features = dp.scada_features(pd.read_csv(scada_path, nrows=0).columns)
+    values = _allocate(out_dir, "values", (n_rows, len(features)), dtype)
+
+    # Pass 2: each chunk is scattered to its sorted position in the output.
+    start = 0
+    for chunk in pd.read_csv(scada_path, chunksize=chunksize):
+        chunk_rank = rank[start: start + len(chunk)]
+        start += len(chunk)
+
+        keep = chunk_rank < n_rows
+        if not keep.any():
+            continue
+        chunk = chunk.loc[keep]
+        chunk_rank = chunk_rank[keep]
+
+        chunk = dp.add_inverter_features(chunk)
+        chunk["RUL"] = rul[chunk_rank]
+        values[chunk_rank] = chunk[features].values
+
+    return pd.DatetimeIndex(times[:n_rows], name="Time"), features, values
+
+
+def streaming_data_preprocessing(
+    scada_path=dp.SCADA_PATH,
+    status_path=dp.STATUS_PATH,
+    timesteps=dp.TIMESTEPS,
+    fault_codes=dp.FAULT_CODES,
+    row_limit=dp.ROW_LIMIT,
+    chunksize=CHUNKSIZE,
+    out_dir=None,
+    compact=False,
+):
+    # Lag windows are views over the assembled rows (see dp.lag_features), so
+    # windows that straddle chunk boundaries need no state carried over.
+    dtypes = dp.COMPACT_DTYPES if compact else dp.DEFAULT_DTYPES
+    index, features, values = streaming_preprocess_scada(
+        scada_path,
+        status_path,
+        fault_codes,
+        row_limit,
+        chunksize,
+        out_dir,
+        dtypes["values"],
+    )
+    return dp.build_frames(index, features, values, timesteps, compact=compact)
@@ -0,0 +1,282 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+import data_preprocessing as dp
+
+START = "2014-05-01"
+ROW_SECONDS = 600
+CHUNKSIZE = 250000
+RATED_POWER = 2050.0
+DAYS_BETWEEN_FAULTS = 5.0
+STATUS_EVENTS_PER_DAY = 6.0
+
+WEC_COLUMNS = [
+    "WEC: ava. windspeed",
+    "WEC : max. windspeed",
+    "WEC : min. windspeed",
+    "WEC: ava. Rotation",
+    "WEC: max. Rotation",
+    "WEC: min. Rotation",
+    "WEC: ava. Power",
+    "WEC: max. Power",
+    "WEC: min. Power",
+    "WEC: ava. Nacel position including cable twisting",
+    "WEC: Operating Hours",
+    "WEC: Production kWh",
+    "WEC: Production minutes",
+    "WEC: ava. reactive Power",
+    "WEC: max. reactive Power",
+    "WEC: min. reactive Power",
+    "WEC: ava. available P from wind",
+    "WEC: ava. available P technical reasons",
+    "WEC: ava. Available P force majeure reasons",
+    "WEC: ava. Available P force external reasons",
+    "WEC: ava. blade angle A",
+]
+INVERTER_TEMP_COLUMNS = [
+    f"CS101 : Sys {system} inverter {inverter} cabinet temp."
+    for system in (1, 2)
+    for inverter in range(1, 8)
+]
+# Temperatures other than the inverter cabinets: (name, offset over ambient at
+# standstill, rise at rated power).
+TEMPERATURES = [
+    ("CS101 : Spinner temp.", 2.0, 6.0),
+    ("CS101 : Front bearing temp.", 8.0, 22.0),
+    ("CS101 : Rear bearing temp.", 6.0, 18.0),
+    ("CS101 : Pitch cabinet blade A temp.", 5.0, 4.0),
+    ("CS101 : Pitch cabinet blade B temp.", 5.0, 4.0),
+    ("CS101 : Pitch cabinet blade C temp.", 5.0, 4.0),
+    ("CS101 : Blade A temp.", 1.0, 2.0),
+    ("CS101 : Blade B temp.", 1.0, 2.0),
+    ("CS101 : Blade C temp.", 1.0, 2.0),
+    ("CS101 : Rotor temp. 1", 10.0, 35.0),
+    ("CS101 : Rotor temp. 2", 10.0, 35.0),
+    ("CS101 : Stator temp. 1", 12.0, 45.0),
+    ("CS101 : Stator temp. 2", 12.0, 45.0),
+    ("CS101 : Nacelle ambient temp. 1", 4.0, 6.0),
+    ("CS101 : Nacelle ambient temp. 2", 4.0, 6.0),
+    ("CS101 : Nacelle temp.", 6.0, 10.0),
+    ("CS101 : Nacelle cabinet temp.", 12.0, 8.0),
+    ("CS101 : Main carrier temp.", 5.0, 12.0),
+    ("CS101 : Rectifier cabinet temp.", 14.0, 16.0),
+    ("CS101 : Yaw inverter cabinet temp.", 12.0, 4.0),
+    ("CS101 : Fan inverter cabinet temp.", 12.0, 6.0),
+    ("CS101 : Ambient temp.", 0.0, 0.0),
+    ("CS101 : Tower temp.", 3.0, 3.0),
+    ("CS101 : Control cabinet temp.", 15.0, 5.0),
+    ("CS101 : Transformer temp.", 8.0, 40.0),
+]
+SCADA_COLUMNS = (
+    ["Time", "Error"]
+    + WEC_COLUMNS
+    + INVERTER_TEMP_COLUMNS
+    + [name for name, _, _ in TEMPERATURES]
+    + ["RTU: ava. Setpoint 1"]
+)
+STATUS_COLUMNS = [
+    "Time",
+    "Main Status",
+    "Sub Status",
+    "Full Status",
+    "Status Text",
+    "T",
+    "Service",
+    "FaultMsg",
+    "Value0",
+]
+STATUS_TEXT = {
+    0: "Turbine in operation",
+    2: "Lack of wind",
+    9: "Generator heating",
+    60: "Mains failure",
+    62: "Feeding fault",
+    80: "Excitation error",
+    228: "Timeout warn message",
+}
+OPERATING_CODES = (0, 2)
+
+
+class ScadaGenerator:
+    # 10-minute SCADA rows with the export's schema, generated chunk by chunk
+    # from one seed: wind follows a slow AR(1) process, power, rotation and
+    # pitch follow wind through a simple power curve, and temperatures follow
+    # the daily and yearly cycle plus load. Filter states and cumulative
+    # counters carry over, so the chunks join into one continuous series.
+
+    def __init__(self, seed=0, start=START):
+        self.rng = np.random.default_rng(seed)
+        self.start = pd.Timestamp(start)
+        self.row = 0
+        self._wind_state = np.zeros(1)
+        self._yaw_state = np.zeros(1)
+        self._temp_state = np.zeros(1)
+        self._hours = 0.0
+        self._kwh = 0.0
+        self._minutes = 0.0
+
+    def _ar1(self, n, phi, state):
+        # Unit-variance AR(1) noise continuing from state.
+        noise = self.rng.standard_normal(n) * np.sqrt(1 - phi ** 2)
+        out, _ = lfilter([1.0], [1.0, -phi], noise, zi=state * phi)
+        state[:] = out[-1]
+        return out
+
+    def _noise(self, n, scale):
+        return self.rng.standard_normal(n) * scale
+
+    def chunk(self, n_rows):
+        times = self.start + pd.to_timedelta(
+            (self.row + np.arange(n_rows)) * ROW_SECONDS, unit="s"
+        )
+        self.row += n_rows
+        noise = self._noise
+
+        wind = np.clip(6.5 + 3.2 * self._ar1(n_rows, 0.995, self._wind_state), 0, 28)
+        gusts = np.abs(noise(n_rows, 0.15))
+        load = np.clip((wind - 3.0) / (12.5 - 3.0), 0, 1) ** 3
+        load[wind > 25.0] = 0.0
+        running = load > 0
+        power = RATED_POWER * load + noise(n_rows, 15.0) * running
+        rotation = np.where(running, np.clip(6 + 0.9 * wind, 6, 14.5), 0.5 + gusts)
+        pitch = np.clip((wind - 12.5) * 2.5, 0, 30) + np.abs(noise(n_rows, 0.3))
+        blade = np.where(running, pitch, 60.0)
+        reactive = 0.12 * power + noise(n_rows, 10.0)
+
+        # Counters accumulate over the whole series, not per chunk.
+        hours = self._hours + np.cumsum(running) / 6.0
+        kwh = self._kwh + np.cumsum(np.maximum(power, 0)) / 6.0
+        minutes = self._minutes + np.cumsum(running) * 10.0
+        self._hours, self._kwh, self._minutes = hours[-1], kwh[-1], minutes[-1]
+
+        day = times.dayofyear.values / 365.25
+        hour = (times.hour.values + times.minute.values / 60.0) / 24.0
+        ambient = (
+            9.0
+            - 9.0 * np.cos(2 * np.pi * (day - 0.05))
+            - 3.5 * np.cos(2 * np.pi * (hour - 0.1))
+            + 1.5 * self._ar1(n_rows, 0.99, self._temp_state)
+        )
+
+        columns = {
+            "Time": times.strftime("%d/%m/%Y %H:%M:%S"),
+            "Error": np.zeros(n_rows, dtype="int64"),
+            "WEC: ava. windspeed": wind,
+            "WEC : max. windspeed": wind * (1 + 2 * gusts),
+            "WEC : min. windspeed": np.maximum(wind * (1 - 2 * gusts), 0),
+            "WEC: ava. Rotation": rotation,
+            "WEC: max. Rotation": rotation * (1 + gusts / 3),
+            "WEC: min. Rotation": rotation * (1 - gusts / 3),
+            "WEC: ava. Power": power,
+            "WEC: max. Power": np.minimum(power * (1 + gusts), RATED_POWER * 1.05),
+            "WEC: min. Power": power * (1 - gusts),
+            "WEC: ava. Nacel position including cable twisting": 180
+            + 150 * self._ar1(n_rows, 0.9995, self._yaw_state),
+            "WEC: Operating Hours": hours,
+            "WEC: Production kWh": kwh,
+            "WEC: Production minutes": minutes,
+            "WEC: ava. reactive Power": reactive,
+            "WEC: max. reactive Power": reactive + np.abs(noise(n_rows, 20.0)),
+            "WEC: min. reactive Power": reactive - np.abs(noise(n_rows, 20.0)),
+            "WEC: ava. available P from wind": np.maximum(power, 0) * 1.03,
+            "WEC: ava. available P technical reasons": np.maximum(power, 0),
+            "WEC: ava. Available P force majeure reasons": np.zeros(n_rows),
+            "WEC: ava. Available P force external reasons": np.zeros(n_rows),
+            "WEC: ava. blade angle A": blade,
+        }
+        for column in INVERTER_TEMP_COLUMNS:
+            columns[column] = ambient + 18.0 + 14.0 * load + noise(n_rows, 0.8)
+        for column, offset, rise in TEMPERATURES:
+            columns[column] = ambient + offset + rise * load + noise(n_rows, 0.5)
+        columns["RTU: ava. Setpoint 1"] = np.full(n_rows, RATED_POWER)
+        return pd.DataFrame(columns, columns=SCADA_COLUMNS)
+
+
+def status_events(start, n_rows, seed=0):
+    # Fault codes (dp.FAULT_CODES) about every DAYS_BETWEEN_FAULTS days, each
+    # followed by a return to operation, among routine operating codes. The
+    # last fault falls in the last day, so RUL trims only a few rows.
+    rng = np.random.default_rng(seed + 1)
+    span = n_rows * ROW_SECONDS
+    n_faults = max(int(span / 86400 / DAYS_BETWEEN_FAULTS), 1)
+    faults = rng.uniform(0, span, n_faults)
+    faults[-1] = span - rng.uniform(ROW_SECONDS, max(min(86400, span), ROW_SECONDS))
+    n_routine = max(int(span / 86400 * STATUS_EVENTS_PER_DAY), 1)
+    seconds = np.concatenate(
+        [
+            faults,
+            faults + rng.uniform(60, 3600, n_faults),
+            rng.uniform(0, span, n_routine),
+        ]
+    )
+    codes = np.concatenate(
+        [
+            rng.choice(dp.FAULT_CODES, n_faults),
+            np.zeros(n_faults, dtype="int64"),
+            rng.choice(OPERATING_CODES, n_routine),
+        ]
+    )
+    order = np.argsort(seconds, kind="mergesort")
+    seconds, codes = seconds[order], codes[order]
+    sub = np.where(np.isin(codes, dp.FAULT_CODES), rng.integers(1, 20, len(codes)), 0)
+    times = pd.Timestamp(start) + pd.to_timedelta(seconds.round(), unit="s")
+    return pd.DataFrame(
+        {
+            "Time": times.strftime("%Y-%m-%d %H:%M:%S"),
+            "Main Status": codes,
+            "Sub Status": sub,
+            "Full Status": [f"{c} : {s}" for c, s in zip(codes, sub)],
+            "Status Text": [STATUS_TEXT[c] for c in codes],
+            "T": 1,
+            "Service": 0,
+            "FaultMsg": np.isin(codes, dp.FAULT_CODES),
+            "Value0": 0,
+        },
+        columns=STATUS_COLUMNS,
+    )
+
+
+def write_synthetic(
+    directory, n_rows, seed=0, start=START, chunksize=CHUNKSIZE, overwrite=False
+):
+    # Writes SCADA_data.csv and status_data_wec.csv into directory, chunk by
+    # chunk, so memory stays bounded by chunksize at any n_rows.
+    scada_path = os.path.join(directory, os.path.basename(dp.SCADA_PATH))
+    status_path = os.path.join(directory, os.path.basename(dp.STATUS_PATH))
+    for path in (scada_path, status_path):
+        if os.path.exists(path) and not overwrite:
+            raise FileExistsError(f"{path} exists; pass overwrite=True to replace it")
+    os.makedirs(directory, exist_ok=True)
+
+    generator = ScadaGenerator(seed, start)
+    for chunk_start in range(0, n_rows, chunksize):
+        chunk = generator.chunk(min(chunksize, n_rows - chunk_start))
+        chunk.to_csv(
+            scada_path,
+            mode="w" if chunk_start == 0 else "a",
+            header=chunk_start == 0,
+            index=False,
+            float_format="%.2f",
+        )
+    status_events(start, n_rows, seed).to_csv(status_path, index=False)
+    return scada_path, status_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic SCADA and status data")
+    parser.add_argument("--rows", type=int, default=dp.ROW_LIMIT)
+    parser.add_argument("--out", default=os.path.dirname(dp.SCADA_PATH))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default=START)
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    for path in write_synthetic(
+        args.out, args.rows, args.seed, args.start, args.chunksize, args.overwrite
+    ):
+        print(path)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from aggregate_pyramid import AggregatePyramid
+
+
+def frame(n_rows=30000, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2014-05-01", periods=n_rows, freq="10min", name="Time")
+    return pd.DataFrame(
+        {"power": rng.normal(0, 100, n_rows).cumsum(), "wind": rng.random(n_rows)},
+        index=index,
+    )
+
+
+def test_envelope_stays_inside_the_plotted_rows():
+    df = frame()
+    pyramid = AggregatePyramid(df)
+    start, end = df.index.get_indexer(
+        [pd.Timestamp("2014-09-15 13:10"), pd.Timestamp("2014-11-20 02:00")]
+    )
+    rows = df.iloc[start : end + 1]
+    x, y = pyramid.envelope(
+        "power", rows.index.asi8, rows["power"].values, max_points=400
+    )
+    assert x[0] >= rows.index[0] and x[-1] <= rows.index[-1]
+    assert y.max() == rows["power"].max() and y.min() == rows["power"].min()
+    assert len(y) <= 400 + 4
+
+
+def test_refresh_matches_a_fresh_build():
+    df = frame()
+    head = df.iloc[:20000]
+    pyramid = AggregatePyramid(head)
+    pyramid.envelope("wind", head.index.asi8, head["wind"].values, 200)
+    pyramid.refresh(df, changed_from=19990)
+    fresh = AggregatePyramid(df)
+    args = (df.index.asi8, df["wind"].values, 200)
+    got = pyramid.envelope("wind", *args)
+    expected = fresh.envelope("wind", *args)
+    for a, b in zip(got, expected):
+        np.testing.assert_array_equal(a, b)
@@ -0,0 +1,34 @@
+import json
+
+import numpy as np
+import pytest
+
+import data_preprocessing as dp
+from batch_scoring import ScoringError, parse_windows
+
+FEATURES = ["a", "b", "RUL"]
+COLUMNS = dp.lag_columns(FEATURES)
+
+
+def rows_body(extra=None, n_rows=dp.TIMESTEPS + 2):
+    rows = [dict({"a": i, "b": 2.0 * i}, **(extra or {})) for i in range(n_rows)]
+    return json.dumps({"rows": [rows]}).encode()
+
+
+def test_rows_need_no_rul_and_score_it_as_missing():
+    (window,) = parse_windows("application/json", rows_body(), COLUMNS, FEATURES)
+    (sent,) = parse_windows(
+        "application/json", rows_body({"RUL": 50}), COLUMNS, FEATURES
+    )
+    rul = [i for i, c in enumerate(COLUMNS) if c.split("_")[0] == "RUL"]
+    assert np.isnan(window[:, rul]).all()
+    np.testing.assert_array_equal(window, sent)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [{"windows": 5}, {"windows": [["a"]]}, {"rows": [[1, 2]]}, {"rows": [5]}],
+)
+def test_malformed_bodies_raise_scoring_error(payload):
+    with pytest.raises(ScoringError):
+        parse_windows("application/json", json.dumps(payload), COLUMNS, FEATURES)
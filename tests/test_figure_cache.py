@@ -0,0 +1,21 @@
+import shutil
+
+from figure_cache import FigureCache
+
+
+def test_failed_shared_write_falls_back_to_the_lru(tmp_path):
+    directory = tmp_path / "figures"
+    cache = FigureCache(directory=str(directory))
+    shutil.rmtree(directory)
+    cache.put("key", "{}")
+    assert cache.get("key") == "{}"
+    assert cache.stats()["write_errors"] == 1
+
+
+def test_unusable_directory_leaves_the_lru(tmp_path):
+    taken = tmp_path / "file"
+    taken.write_text("")
+    cache = FigureCache(directory=str(taken / "figures"))
+    assert cache.directory is None
+    cache.put("key", "{}")
+    assert cache.get("key") == "{}"
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_preprocessing as dp
+from data_cache import load_processed, save_processed
+from incremental_preprocessing import IncrementalPreprocessor, parse_new_data
+
+
+@pytest.fixture(scope="module")
+def history(tmp_path_factory):
+    from synthetic_data import write_synthetic
+
+    directory = tmp_path_factory.mktemp("data")
+    write_synthetic(str(directory), 6000)
+    scada = pd.read_csv(directory / "SCADA_data.csv")
+    status = pd.read_csv(directory / "status_data_wec.csv")
+    return directory, scada, status
+
+
+def snapshot(frames):
+    return [frame.copy() for frame in frames]
+
+
+def assert_frames_equal(got, expected):
+    for a, b in zip(got, expected):
+        if isinstance(a, pd.Series):
+            pd.testing.assert_series_equal(a, b)
+        else:
+            pd.testing.assert_frame_equal(a, b)
+
+
+def test_published_frames_are_never_written(history):
+    _, scada, status = history
+    features = dp.scada_features(scada.columns)
+    state = IncrementalPreprocessor(features)
+    published = []
+    # In-order chunks, each with the status events seen so far, then a late
+    # chunk that lands before rows already published.
+    late = scada.iloc[2000:2100]
+    rest = scada.drop(late.index)
+    for chunk in np.array_split(rest, 5):
+        last = dp.parse_time(chunk["Time"]).max()
+        events = status[pd.to_datetime(status["Time"]) <= last]
+        frames = state.append(chunk, events)
+        published.append((frames, snapshot(frames)))
+    frames = state.append(late, status)
+    for frames_then, copy in published:
+        assert_frames_equal(frames_then, copy)
+
+    index, _, values = state.processed()
+    expected = IncrementalPreprocessor(features)
+    expected.append(scada, status)
+    np.testing.assert_array_equal(index, expected.processed()[0])
+    np.testing.assert_array_equal(values, expected.processed()[2])
+    assert len(frames[0]) == len(scada)
+
+
+def test_cache_entry_is_mapped_not_copied(history, tmp_path):
+    directory, scada, status = history
+    features = dp.scada_features(scada.columns)
+    seed = IncrementalPreprocessor(features)
+    seed.append(scada.iloc[:4000], status)
+    tail = scada.iloc[seed.n_labelled :]
+    entry = str(tmp_path / "entry")
+    save_processed(entry, *seed.processed())
+
+    state = IncrementalPreprocessor.from_cache_entry(
+        entry, directory / "status_data_wec.csv"
+    )
+    values = load_processed(entry, mmap_mode="r")[2]
+    assert isinstance(state._values, np.memmap)
+    assert state._values.filename == values.filename
+
+    before = state.frames()
+    copy = snapshot(before)
+    for chunk in np.array_split(tail, 4):
+        frames = state.append(chunk)
+    assert_frames_equal(before, copy)
+    assert isinstance(state._values, np.memmap)
+    assert state._values.filename != values.filename
+    assert len(frames[0]) == seed.n_labelled + len(tail)
+    expected = IncrementalPreprocessor(features)
+    expected_df = expected.append(scada, status)[0]
+    pd.testing.assert_frame_equal(frames[0], expected_df)
+
+
+def test_unparseable_time_is_rejected(history):
+    _, scada, _ = history
+    records = scada.head(3).to_dict("records")
+    records[1]["Time"] = "not a time"
+    with pytest.raises(ValueError, match=r"positions \[1\]"):
+        parse_new_data({"scada": records}, dp.scada_features(scada.columns))
@@ -0,0 +1,101 @@
+import importlib
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from background_jobs import DONE, FAILED, JobQueue
+
+
+def wait(queue, job, timeout=10.0):
+    deadline = time.time() + timeout
+    while queue.status(job)[0] not in (DONE, FAILED):
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return queue.status(job)
+
+
+def test_failed_job_is_only_rerun_on_retry():
+    calls = []
+    lock = threading.Lock()
+
+    def fail():
+        with lock:
+            calls.append(1)
+        raise ValueError("feature shape mismatch")
+
+    queue = JobQueue()
+    job = queue.submit("predict", fail)
+    state, result = wait(queue, job)
+    assert state == FAILED and "feature shape mismatch" in result
+
+    for _ in range(5):
+        assert queue.submit("predict", fail) == job
+        assert queue.status(job)[0] == FAILED
+    assert len(calls) == 1
+
+    queue.submit("predict", fail, retry=True)
+    wait(queue, job)
+    assert len(calls) == 2
+
+
+@pytest.fixture
+def failing_app(tmp_path, monkeypatch):
+    # The app over a small synthetic history, serving a model trained on a
+    # different number of features, so every prediction job fails.
+    from synthetic_data import write_synthetic
+
+    write_synthetic(str(tmp_path / "data"), 3000)
+    rng = np.random.default_rng(0)
+    booster = xgb.train(
+        {"objective": "reg:squarederror"},
+        xgb.DMatrix(rng.random((50, 3)), label=rng.random(50)),
+        2,
+    )
+    model_path = str(tmp_path / "model.json")
+    booster.save_model(model_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MODEL_PATH", model_path)
+    monkeypatch.setenv("ROW_LIMIT", "0")
+    monkeypatch.delenv("JOB_STORE", raising=False)
+    monkeypatch.delenv("JOB_EXECUTOR", raising=False)
+    import model_registry
+
+    importlib.reload(model_registry)
+    return importlib.import_module("app")
+
+
+def test_failed_prediction_shows_error_and_stops_polling(failing_app):
+    from benchmark import CALLBACK_PATH, update_graph_body
+
+    client = failing_app.server.test_client()
+
+    def post(changed, n_intervals=None):
+        body = update_graph_body(
+            n_get_new_info=1, n_pred=1, n_intervals=n_intervals, changed=changed
+        )
+        response = client.post(CALLBACK_PATH, json=body)
+        assert response.status_code in (200, 204)
+        if response.status_code == 204:
+            return None
+        return json.loads(response.data)["response"]
+
+    post("predict-button.n_clicks")
+    deadline = time.time() + 30
+    for n_intervals in range(1, 1000):
+        response = post("job-poll-interval.n_intervals", n_intervals)
+        if response is not None and response["job-poll-interval"]["disabled"]:
+            break
+        assert time.time() < deadline, "polling never stopped"
+        time.sleep(0.05)
+    assert response["Info-Textbox"]["value"].startswith("RUL estimation failed")
+
+    # Later polls read the failure instead of queueing the job again.
+    job = failing_app.prediction_job()
+    for n_intervals in range(n_intervals + 1, n_intervals + 4):
+        response = post("job-poll-interval.n_intervals", n_intervals)
+        assert response["job-poll-interval"]["disabled"]
+        assert failing_app.jobs.status(job)[0] == FAILED
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+def row_range(index, start=None, end=None):
+    # Positions of the rows with start < time <= end in a sorted DatetimeIndex,
+    # as the date-picker masks select them; either bound may be left open.
+    lo, hi = 0, len(index)
+    if start is not None:
+        lo = index.searchsorted(pd.Timestamp(start), side="right")
+    if end is not None:
+        hi = index.searchsorted(pd.Timestamp(end), side="right")
+    return lo, hi
+
+
+def time_slice(frame, start=None, end=None, columns=None):
+    # Two binary searches and a positional slice instead of a boolean mask
+    # over the whole index: the rows are not copied. columns may be a single
+    # name, which gives a Series view, or a list of names.
+    lo, hi = row_range(frame.index, start, end)
+    if columns is None:
+        return frame.iloc[lo:hi]
+    if isinstance(columns, str):
+        return frame[columns].iloc[lo:hi]
+    return frame.iloc[lo:hi][list(columns)]
+
+
+class RowLookup:
+    # Timestamp -> values of a few columns of a time-indexed frame, copied
+    # once into one (rows, columns) array so looking up many times is one
+    # vectorized binary search and one fancy-indexed fetch. Times not in the
+    # index, such as pyramid bucket starts, resolve to the nearest row.
+
+    def __init__(self, frame, columns):
+        self.columns = list(columns)
+        self._index = np.empty(0, dtype="int64")
+        self._values = np.empty((0, len(self.columns)), dtype="float64")
+        self._rows = self._index, self._values
+        self.extend(frame)
+
+    def extend(self, frame, changed_from=0):
+        # frame replaces the one the lookup was built from; rows before
+        # changed_from are unchanged. Lookups in flight view the published
+        # rows, so only rows past them are written in place, into buffers
+        # grown by doubling; a change to an earlier row copies the buffers.
+        published = len(self._rows[0])
+        n_rows = len(frame)
+        if changed_from < published or n_rows > len(self._index):
+            capacity = max(n_rows, 2 * len(self._index), 1024)
+            index = np.empty(capacity, dtype="int64")
+            values = np.empty((capacity, len(self.columns)), dtype="float64")
+            index[:changed_from] = self._index[:changed_from]
+            values[:changed_from] = self._values[:changed_from]
+            self._index, self._values = index, values
+        self._index[changed_from:n_rows] = frame.index.asi8[changed_from:]
+        self._values[changed_from:n_rows] = (
+            frame[self.columns].iloc[changed_from:].to_numpy(dtype="float64")
+        )
+        self._rows = self._index[:n_rows], self._values[:n_rows]
+
+    @property
+    def index(self):
+        return self._rows[0]
+
+    @property
+    def values(self):
+        return self._rows[1]
+
+    def positions(self, times, index=None):
+        index = self.index if index is None else index
+        times = np.asarray(times, dtype="datetime64[ns]").view("int64")
+        last = len(index) - 1
+        right = np.minimum(index.searchsorted(times), last)
+        left = np.maximum(right - 1, 0)
+        closer_left = times - index[left] < index[right] - times
+        return np.where(closer_left, left, right)
+
+    def rows(self, times):
+        index, values = self._rows
+        return values[self.positions(times, index)]
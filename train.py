@@ -0,0 +1,298 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import ParameterSampler, TimeSeriesSplit
+
+import data_preprocessing as dp
+from data_cache import cached_data_preprocessing, cached_preprocess_scada
+from prediction_cache import window_key
+
+MODELS_DIR = "assets/models"
+N_ITER = 10
+N_SPLITS = 5
+EARLY_STOPPING_ROUNDS = 10
+SEED = 10
+
+# Modeling.ipynb's grid; its "0,3" learning rate was meant to be 0.3.
+PARAM_GRID = {
+    "max_depth": [6, 10, 15, 20],
+    "learning_rate": [0.001, 0.01, 0.1, 0.2, 0.3],
+    "subsample": [0.5, 0.6, 0.7, 0.8, 0.9, 1.0],
+    "colsample_bytree": [0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0],
+    "colsample_bylevel": [0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0],
+    "min_child_weight": [0.5, 1.0, 3.0, 5.0, 7.0, 10.0],
+    "gamma": [0, 0.25, 0.5, 1.0],
+    "reg_lambda": [0.1, 1.0, 5.0, 10.0, 50.0, 100.0],
+    "n_estimators": [30, 40, 50, 60, 70, 90, 80, 100],
+}
+
+_data = {}
+
+
+def booster_params(params, nthread):
+    params = dict(params)
+    params.pop("n_estimators")
+    params["lambda"] = params.pop("reg_lambda")
+    params.update(
+        objective="reg:squarederror",
+        tree_method="hist",
+        nthread=nthread,
+        seed=SEED,
+    )
+    return params
+
+
+def fit(params, x, y, nthread, x_valid=None, y_valid=None, num_boost_round=None):
+    dtrain = xgb.DMatrix(np.asarray(x, dtype="float32"), label=np.asarray(y))
+    if x_valid is None:
+        return xgb.train(
+            booster_params(params, nthread),
+            dtrain,
+            num_boost_round or params["n_estimators"],
+        )
+    dvalid = xgb.DMatrix(
+        np.asarray(x_valid, dtype="float32"), label=np.asarray(y_valid)
+    )
+    # n_estimators is the upper bound; a fold stops once its validation RMSE
+    # has not improved for EARLY_STOPPING_ROUNDS rounds.
+    return xgb.train(
+        booster_params(params, nthread),
+        dtrain,
+        params["n_estimators"],
+        evals=[(dvalid, "valid")],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=False,
+    )
+
+
+def rmse(y_true, y_pred):
+    return float(np.sqrt(np.mean((np.asarray(y_true) - y_pred) ** 2)))
+
+
+def mae(y_true, y_pred):
+    return float(np.mean(np.abs(np.asarray(y_true) - y_pred)))
+
+
+def load_training_data(row_limit=dp.ROW_LIMIT, compact=False):
+    df, _, x_test, y_test, x_train = cached_data_preprocessing(
+        row_limit=row_limit, compact=compact, mmap_mode="r"
+    )
+    y_train = df["RUL"].iloc[: len(x_train)]
+    return x_train, y_train, x_test, y_test
+
+
+def _init_worker(row_limit, compact):
+    # Each worker maps the cached arrays instead of receiving pickled frames.
+    _data["train"] = load_training_data(row_limit, compact)
+
+
+def _run_fold(params, train_rows, valid_rows, nthread):
+    x_train, y_train, _, _ = _data["train"]
+    booster = fit(
+        params,
+        x_train.values[train_rows[0]: train_rows[1]],
+        y_train.values[train_rows[0]: train_rows[1]],
+        nthread,
+        x_train.values[valid_rows[0]: valid_rows[1]],
+        y_train.values[valid_rows[0]: valid_rows[1]],
+    )
+    return float(booster.best_score), int(booster.best_iteration)
+
+
+def sample_params(n_iter, seed=SEED):
+    return list(ParameterSampler(PARAM_GRID, n_iter, random_state=seed))
+
+
+def time_series_folds(n_rows, n_splits=N_SPLITS):
+    # Expanding window: every fold trains on the past and validates on the
+    # block that follows it, never the other way round.
+    return [
+        ((int(train[0]), int(train[-1]) + 1), (int(valid[0]), int(valid[-1]) + 1))
+        for train, valid in TimeSeriesSplit(n_splits).split(np.empty(n_rows))
+    ]
+
+
+def trial_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def read_checkpoint(path):
+    trials = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    trial = json.loads(line)
+                except ValueError:
+                    continue  # line cut off by an interrupted run
+                trials[trial_key(trial["params"])] = trial
+    return trials
+
+
+def search(
+    n_rows,
+    checkpoint,
+    n_iter=N_ITER,
+    n_splits=N_SPLITS,
+    n_jobs=-1,
+    row_limit=dp.ROW_LIMIT,
+    compact=False,
+):
+    # Every (trial, fold) pair is one task in a process pool using all cores.
+    # A trial is appended to the checkpoint as soon as its last fold is done,
+    # and trials already in the checkpoint are not run again.
+    trials = read_checkpoint(checkpoint)
+    folds = time_series_folds(n_rows, n_splits)
+    pending = [p for p in sample_params(n_iter) if trial_key(p) not in trials]
+    print(f"{len(trials)} trials in checkpoint, {len(pending)} to run")
+
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    n_tasks = len(pending) * len(folds)
+    if n_tasks:
+        workers = min(n_jobs, n_tasks)
+        # Left-over cores go to xgboost's own threads.
+        nthread = max(n_jobs // workers, 1)
+        results = {trial_key(p): {} for p in pending}
+        with ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(row_limit, compact)
+        ) as pool, open(checkpoint, "a") as out:
+            futures = {
+                pool.submit(_run_fold, params, train_rows, valid_rows, nthread): (
+                    params,
+                    i,
+                )
+                for params in pending
+                for i, (train_rows, valid_rows) in enumerate(folds)
+            }
+            for future in as_completed(futures):
+                params, i = futures[future]
+                fold_results = results[trial_key(params)]
+                fold_results[i] = future.result()
+                if len(fold_results) < len(folds):
+                    continue
+                scores = [fold_results[j] for j in range(len(folds))]
+                trial = {
+                    "params": params,
+                    "rmse": [score for score, _ in scores],
+                    "best_iteration": [iteration for _, iteration in scores],
+                }
+                trial["mean_rmse"] = float(np.mean(trial["rmse"]))
+                out.write(json.dumps(trial) + "\n")
+                out.flush()
+                trials[trial_key(params)] = trial
+                print(f"rmse {trial['mean_rmse']:.3f} {params}")
+    return min(trials.values(), key=lambda trial: trial["mean_rmse"])
+
+
+def search_id(values, timesteps, y_train, n_splits):
+    # x_train is a strided view of lag windows over the cached rows, so those
+    # rows and timesteps identify it; hashing the windows would copy them.
+    h = hashlib.blake2b(digest_size=8)
+    h.update(window_key(values).encode())
+    h.update(np.ascontiguousarray(y_train.values).data)
+    h.update(f"{timesteps}:{n_splits}:{EARLY_STOPPING_ROUNDS}:{SEED}".encode())
+    return h.hexdigest()
+
+
+def publish(path, target):
+    # Atomic, so the registry never reads a half-written model.
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(src.read())
+    os.replace(tmp, target)
+
+
+def train(
+    models_dir=MODELS_DIR,
+    n_iter=N_ITER,
+    n_splits=N_SPLITS,
+    n_jobs=-1,
+    row_limit=dp.ROW_LIMIT,
+    compact=False,
+    publish_to=None,
+):
+    start = time.perf_counter()
+    x_train, y_train, x_test, y_test = load_training_data(row_limit, compact)
+    os.makedirs(models_dir, exist_ok=True)
+    values = cached_preprocess_scada(
+        row_limit=row_limit, compact=compact, mmap_mode="r"
+    )[2]
+    rows = len(x_train) + dp.TIMESTEPS
+    run = search_id(values[:rows], dp.TIMESTEPS, y_train, n_splits)
+    checkpoint = os.path.join(models_dir, f"trials-{run}.jsonl")
+    best = search(
+        len(x_train), checkpoint, n_iter, n_splits, n_jobs, row_limit, compact
+    )
+
+    # Refit on the whole training period for the number of rounds the folds
+    # stopped at on average.
+    num_boost_round = int(np.mean(best["best_iteration"])) + 1
+    n_threads = os.cpu_count() if n_jobs == -1 else n_jobs
+    booster = fit(
+        best["params"],
+        x_train.values,
+        y_train.values,
+        n_threads,
+        num_boost_round=num_boost_round,
+    )
+    y_pred = booster.predict(xgb.DMatrix(np.asarray(x_test.values, "float32")))
+    metrics = {
+        "rmse": rmse(y_test, y_pred),
+        "mae": mae(y_test, y_pred),
+        "cv_rmse": best["mean_rmse"],
+        "num_boost_round": num_boost_round,
+        "params": best["params"],
+        "search": run,
+        "row_limit": row_limit,
+        "train_rows": len(x_train),
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+
+    # Native booster JSON, loaded by model_registry like an exported pickle.
+    # The random suffix keeps runs finishing in the same second apart.
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(models_dir, f"xgb_reg-{version}.json")
+    booster.save_model(path)
+    with open(os.path.join(models_dir, f"xgb_reg-{version}.metrics.json"), "w") as f:
+        json.dump(metrics, f, indent=2)
+    if publish_to:
+        publish(path, publish_to)
+    print(f"RMSE : {metrics['rmse']:f}  MAE : {metrics['mae']:f}  -> {path}")
+    return path, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the RUL model")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--n-iter", type=int, default=N_ITER)
+    parser.add_argument("--n-splits", type=int, default=N_SPLITS)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument(
+        "--row-limit",
+        type=int,
+        default=dp.ROW_LIMIT,
+        help="labelled rows to train on, 0 for all (default: the app's default)",
+    )
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument(
+        "--publish",
+        metavar="PATH",
+        help="also copy the model here, e.g. the MODEL_PATH the app serves",
+    )
+    args = parser.parse_args()
+    train(
+        args.models_dir,
+        args.n_iter,
+        args.n_splits,
+        args.n_jobs,
+        args.row_limit or None,
+        args.compact,
+        args.publish,
+    )